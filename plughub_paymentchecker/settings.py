@@ -34,10 +34,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'portal',
 ]
 
 MIDDLEWARE = [
+    'portal.dbtiming.DatabaseTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,26 +71,161 @@ TEMPLATES = [
 WSGI_APPLICATION = 'plughub_paymentchecker.wsgi.application'
 
 
+# Connection reuse. Under WSGI each worker thread keeps its connection open for
+# PLUGHUB_DB_CONN_MAX_AGE seconds. Under ASGI (PLUGHUB_ASYNC_API) connections are not
+# reused between requests, so psycopg's pool is enabled by default instead; it needs
+# psycopg[pool]. Django does not allow pooling and CONN_MAX_AGE together.
+PLUGHUB_DB_POOL = os.environ.get("PLUGHUB_DB_POOL", os.environ.get("PLUGHUB_ASYNC_API", "False")).lower() == "true"
+_db_options = {"connect_timeout": int(os.environ.get("PLUGHUB_DB_CONNECT_TIMEOUT", "5"))}
+if PLUGHUB_DB_POOL:
+    _db_options["pool"] = {
+        "min_size": int(os.environ.get("PLUGHUB_DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.environ.get("PLUGHUB_DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.environ.get("PLUGHUB_DB_POOL_TIMEOUT", "10")),
+    }
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # Django's PostgreSQL backend plus connection-acquire timing (portal/dbtiming.py).
+        'ENGINE': 'portal.backends.postgresql',
         # Mirrors the PlugHub IMS/Queue credential scheme; override via env vars if needed.
         'NAME': os.environ.get('PLUGHUB_DB_NAME', 'plughub_paymentchecker'),
         'USER': os.environ.get('PLUGHUB_DB_USER', 'plughub'),
         'PASSWORD': os.environ.get('PLUGHUB_DB_PASSWORD', 'Cablet0w'),
         'HOST': os.environ.get('PLUGHUB_DB_HOST', 'localhost'),
         'PORT': os.environ.get('PLUGHUB_DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if PLUGHUB_DB_POOL else int(os.environ.get('PLUGHUB_DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.environ.get('PLUGHUB_DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+        'OPTIONS': _db_options,
     }
 }
 
-PLUGHUB_ALLOWED_API_KEYS = [
-    key for key in [
-        os.environ.get("PLUGHUB_API_KEY_DEV"),
-        os.environ.get("PLUGHUB_API_KEY_PROD"),
-    ] if key
-]
+# Requests whose connection acquire takes longer than this are logged at WARNING.
+PLUGHUB_DB_SLOW_ACQUIRE_MS = float(os.environ.get("PLUGHUB_DB_SLOW_ACQUIRE_MS", "100"))
+
+# API keys by key ID. Use "key_sha256" instead of "key" to keep raw keys out of settings,
+# "endpoints" to restrict a key to specific views, and "rate_limits" for per-key quotas
+# (same shape as PLUGHUB_RATE_LIMITS).
+PLUGHUB_API_KEYS = {
+    key_id: {"key": key}
+    for key_id, key in [
+        ("dev", os.environ.get("PLUGHUB_API_KEY_DEV")),
+        ("prod", os.environ.get("PLUGHUB_API_KEY_PROD")),
+    ]
+    if key
+}
 
 PAYMONGO_WEBHOOK_SECRET = os.environ.get("PAYMONGO_WEBHOOK_SECRET", "")
+# Extra comma-separated secrets accepted during rotation, alongside PAYMONGO_WEBHOOK_SECRET.
+PAYMONGO_WEBHOOK_SECRETS = [
+    secret.strip()
+    for secret in os.environ.get("PAYMONGO_WEBHOOK_SECRETS", "").split(",")
+    if secret.strip()
+]
+# Reject webhook deliveries signed more than this many seconds away from now (0 disables).
+PAYMONGO_WEBHOOK_TOLERANCE_SECONDS = int(os.environ.get("PAYMONGO_WEBHOOK_TOLERANCE_SECONDS", "300"))
+
+# API rate limits as "<requests>/<seconds>", keyed by scope with a "default" fallback. Each scope
+# (view name, or "paymongo_webhook" for signed PayMongo deliveries) has independent buckets per
+# caller: the API key when one is supplied, otherwise the client IP.
+PLUGHUB_RATE_LIMITS = {
+    "default": os.environ.get("PLUGHUB_RATE_LIMIT_DEFAULT", "60/60"),
+    "check_user_details": os.environ.get("PLUGHUB_RATE_LIMIT_CHECK_USER_DETAILS", "60/60"),
+    "log_payments": os.environ.get("PLUGHUB_RATE_LIMIT_LOG_PAYMENTS", "60/60"),
+    "license_consume": os.environ.get("PLUGHUB_RATE_LIMIT_LICENSE_CONSUME", "60/60"),
+    "check_user_details_batch": os.environ.get("PLUGHUB_RATE_LIMIT_CHECK_USER_DETAILS_BATCH", "10/60"),
+    "log_payments_batch": os.environ.get("PLUGHUB_RATE_LIMIT_LOG_PAYMENTS_BATCH", "10/60"),
+    "license_consume_batch": os.environ.get("PLUGHUB_RATE_LIMIT_LICENSE_CONSUME_BATCH", "10/60"),
+    "paymongo_webhook": os.environ.get("PLUGHUB_RATE_LIMIT_PAYMONGO_WEBHOOK", "600/60"),
+}
+# Dotted path to a limiter class; empty picks in-process counters for LocMemCache, shared cache otherwise.
+PLUGHUB_RATE_LIMIT_BACKEND = os.environ.get("PLUGHUB_RATE_LIMIT_BACKEND", "")
+# Cache alias holding the shared counters; kept off the process-local tier so limits hold across workers.
+PLUGHUB_RATE_LIMIT_CACHE_ALIAS = os.environ.get("PLUGHUB_RATE_LIMIT_CACHE_ALIAS", "shared")
+
+# Serve check_user_details, log_payments and license_consume from the async views in
+# portal/async_views.py. Only worthwhile under an ASGI server (see README).
+PLUGHUB_ASYNC_API = os.environ.get("PLUGHUB_ASYNC_API", "False").lower() == "true"
+
+# When enabled, log_payments queues verified deliveries and answers 202; run
+# `manage.py drain_payment_events` to ingest them into PaymentRecord.
+PLUGHUB_LOG_PAYMENTS_ACCEPT_FAST = os.environ.get("PLUGHUB_LOG_PAYMENTS_ACCEPT_FAST", "False").lower() == "true"
+
+# API request bodies larger than this are rejected with 413 before they are parsed.
+PLUGHUB_API_MAX_BODY_BYTES = int(os.environ.get("PLUGHUB_API_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# /api/logpayments/batch/ accepts larger bodies and writes items in chunks of this size.
+PLUGHUB_API_MAX_BATCH_BODY_BYTES = int(os.environ.get("PLUGHUB_API_MAX_BATCH_BODY_BYTES", str(8 * 1024 * 1024)))
+# Django refuses to read bodies above this, so it must cover the batch endpoint's limit.
+DATA_UPLOAD_MAX_MEMORY_SIZE = max(PLUGHUB_API_MAX_BATCH_BODY_BYTES, 2621440)
+PLUGHUB_LOG_PAYMENTS_BATCH_MAX_ITEMS = int(os.environ.get("PLUGHUB_LOG_PAYMENTS_BATCH_MAX_ITEMS", "5000"))
+PLUGHUB_LOG_PAYMENTS_BATCH_CHUNK_SIZE = int(os.environ.get("PLUGHUB_LOG_PAYMENTS_BATCH_CHUNK_SIZE", "500"))
+PLUGHUB_LICENSE_CONSUME_BATCH_MAX_ITEMS = int(os.environ.get("PLUGHUB_LICENSE_CONSUME_BATCH_MAX_ITEMS", "1000"))
+# `manage.py archive_payments` moves payments consumed more than this many days ago to
+# ArchivedPayment; their references stay reserved and still read as "already used".
+PLUGHUB_PAYMENT_ARCHIVE_AFTER_DAYS = int(os.environ.get("PLUGHUB_PAYMENT_ARCHIVE_AFTER_DAYS", "180"))
+# `manage.py payment_partitions` keeps monthly PaymentRecord partitions this many months
+# ahead, and takes months older than the retention window out of the table (0 keeps all).
+PLUGHUB_PAYMENT_PARTITION_MONTHS_AHEAD = int(os.environ.get("PLUGHUB_PAYMENT_PARTITION_MONTHS_AHEAD", "3"))
+PLUGHUB_PAYMENT_PARTITION_RETAIN_MONTHS = int(os.environ.get("PLUGHUB_PAYMENT_PARTITION_RETAIN_MONTHS", "0"))
+# /api/checkuserdetails/batch/ resolves pairs in queries of this many VALUES rows.
+PLUGHUB_STATUS_BATCH_MAX_ITEMS = int(os.environ.get("PLUGHUB_STATUS_BATCH_MAX_ITEMS", "10000"))
+PLUGHUB_STATUS_BATCH_CHUNK_SIZE = int(os.environ.get("PLUGHUB_STATUS_BATCH_CHUNK_SIZE", "1000"))
+
+# Shared cache backend: "locmem" (per process; the default), "redis", "db" or "file".
+# PLUGHUB_CACHE_LOCATION is the Redis URL (needs the redis package), the cache table
+# (run `manage.py createcachetable`) or the cache directory. "db" and "file" are handy
+# local stand-ins for Redis, but their incr() is not atomic across processes.
+PLUGHUB_CACHE_BACKEND = os.environ.get("PLUGHUB_CACHE_BACKEND", "locmem").lower()
+_CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "plughub"),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+    "db": ("django.core.cache.backends.db.DatabaseCache", "plughub_cache"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", str(BASE_DIR / ".cache")),
+}
+_cache_backend, _cache_location = _CACHE_BACKENDS[PLUGHUB_CACHE_BACKEND]
+# Hot keys are also kept in a per-process LRU in front of the shared cache for up to
+# PLUGHUB_CACHE_LOCAL_TIMEOUT seconds (portal/tiered_cache.py); 0 entries disables it.
+PLUGHUB_CACHE_LOCAL_MAX_ENTRIES = int(os.environ.get("PLUGHUB_CACHE_LOCAL_MAX_ENTRIES", "1024"))
+PLUGHUB_CACHE_LOCAL_TIMEOUT = float(os.environ.get("PLUGHUB_CACHE_LOCAL_TIMEOUT", "5"))
+
+CACHES = {
+    "shared": {
+        "BACKEND": _cache_backend,
+        "LOCATION": os.environ.get("PLUGHUB_CACHE_LOCATION") or _cache_location,
+        "KEY_PREFIX": "plughub",
+    },
+}
+if PLUGHUB_CACHE_BACKEND == "locmem" or PLUGHUB_CACHE_LOCAL_MAX_ENTRIES <= 0:
+    CACHES["default"] = CACHES["shared"]
+else:
+    CACHES["default"] = {
+        "BACKEND": "portal.tiered_cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {
+            "LOCAL_MAX_ENTRIES": PLUGHUB_CACHE_LOCAL_MAX_ENTRIES,
+            "LOCAL_TIMEOUT": PLUGHUB_CACHE_LOCAL_TIMEOUT,
+        },
+    }
+
+# check_user_details caches subscription statuses in this cache alias (0 TTL disables). With a
+# per-process cache (locmem, or the local tier above) other workers only see invalidations
+# once their copy expires. An invalidated entry is blocked from being re-cached for the
+# tombstone TTL, so a lookup that read the row before the change cannot put it back.
+PLUGHUB_STATUS_CACHE_ALIAS = os.environ.get("PLUGHUB_STATUS_CACHE_ALIAS", "default")
+PLUGHUB_STATUS_CACHE_TTL = int(os.environ.get("PLUGHUB_STATUS_CACHE_TTL", "300"))
+PLUGHUB_STATUS_CACHE_TOMBSTONE_TTL = int(os.environ.get("PLUGHUB_STATUS_CACHE_TOMBSTONE_TTL", "5"))
+
+# Dashboard tables page with opaque cursors ("keyset") or page numbers ("offset", which
+# counts and skips rows on every render). Keyset totals are the planner's estimate once a
+# table has at least PLUGHUB_DASHBOARD_EXACT_COUNT_THRESHOLD rows.
+PLUGHUB_DASHBOARD_PAGINATION = os.environ.get("PLUGHUB_DASHBOARD_PAGINATION", "keyset").lower()
+PLUGHUB_DASHBOARD_EXACT_COUNT_THRESHOLD = int(os.environ.get("PLUGHUB_DASHBOARD_EXACT_COUNT_THRESHOLD", "10000"))
+# Browsers may reuse a lazily loaded dashboard table (/dashboard/table/<tab>/) for this many seconds.
+PLUGHUB_DASHBOARD_FRAGMENT_MAX_AGE = int(os.environ.get("PLUGHUB_DASHBOARD_FRAGMENT_MAX_AGE", "15"))
+
+# Customer external IDs are reserved from the counter table in blocks of this size per process.
+PLUGHUB_EXTERNAL_ID_BLOCK_SIZE = int(os.environ.get("PLUGHUB_EXTERNAL_ID_BLOCK_SIZE", "20"))
 
 # Encourage HTTPS in deploys; keep cookies secure.
 CSRF_COOKIE_SECURE = True
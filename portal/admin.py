@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import CustomerSubscription, PaymentRecord
+from . import search
+from .models import ArchivedPayment, CustomerSubscription, PaymentEvent, PaymentRecord
+
+
+def coded_column(name):
+    """List column for a coded field that shows the value as it was written, not just its code's label."""
+    @admin.display(description=name.replace("_", " "), ordering=name)
+    def column(obj):
+        return getattr(obj, f"get_{name}_display")()
+    return column
 
 
 @admin.register(CustomerSubscription)
@@ -10,8 +19,8 @@ class CustomerSubscriptionAdmin(admin.ModelAdmin):
         "product",
         "email",
         "username",
-        "subscription_type",
-        "status",
+        coded_column("subscription_type"),
+        coded_column("status"),
         "last_login",
     )
     search_fields = (
@@ -19,10 +28,8 @@ class CustomerSubscriptionAdmin(admin.ModelAdmin):
         "product",
         "email",
         "username",
-        "subscription_type",
-        "status",
     )
-    list_filter = ("status", "product")
+    list_filter = ("status", "subscription_type", "product")
 
 
 @admin.register(PaymentRecord)
@@ -33,7 +40,7 @@ class PaymentRecordAdmin(admin.ModelAdmin):
         "name",
         "email",
         "amount",
-        "status",
+        coded_column("status"),
         "used",
         "date_consumed",
     )
@@ -42,6 +49,50 @@ class PaymentRecordAdmin(admin.ModelAdmin):
         "payment_id",
         "name",
         "email",
-        "status",
     )
     list_filter = ("status", "used")
+
+    def get_search_results(self, request, queryset, search_term):
+        # Route like the dashboard search: a reference or payment ID is an equality lookup
+        # on its own index instead of icontains across every column. Under "used: No" the
+        # reference arm is served by the unused-reference index.
+        if not search_term.strip():
+            return queryset, False
+        queryset, _ = search.search_payments(queryset, search_term)
+        return queryset, False
+
+
+@admin.register(ArchivedPayment)
+class ArchivedPaymentAdmin(admin.ModelAdmin):
+    list_display = (
+        "reference_number",
+        "payment_id",
+        "name",
+        "email",
+        "amount",
+        coded_column("status"),
+        "date_consumed",
+        "archived_at",
+    )
+    search_fields = ("reference_number", "payment_id", "email")
+    date_hierarchy = "date_consumed"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "received_at",
+        "processed_at",
+        "attempts",
+        "payment",
+        "last_error",
+    )
+    list_filter = ("processed_at",)
+    readonly_fields = ("payload", "received_at")
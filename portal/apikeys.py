@@ -0,0 +1,95 @@
+"""
+API key registry for the public API.
+
+Keys are configured in ``PLUGHUB_API_KEYS`` as ``{key_id: {"key": ...}}`` (or
+``"key_sha256"`` to keep the raw key out of the environment), optionally with an
+``"endpoints"`` allow-list and per-key ``"rate_limits"``. The registry is built once and
+indexed by the SHA-256 digest of each key, so verifying a request is a single dict
+lookup regardless of how many keys are configured, and the raw key is never compared
+directly.
+"""
+
+import hashlib
+import hmac
+import threading
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+@dataclass(frozen=True)
+class ApiKey:
+    key_id: str
+    digest: str
+    endpoints: frozenset = None
+    rate_limits: dict = field(default_factory=dict)
+
+    def allows(self, endpoint):
+        return self.endpoints is None or endpoint in self.endpoints
+
+
+def hash_key(raw_key):
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+class ApiKeyRegistry:
+    def __init__(self, keys=()):
+        self._by_digest = {key.digest: key for key in keys}
+
+    def __len__(self):
+        return len(self._by_digest)
+
+    @classmethod
+    def from_settings(cls):
+        keys = []
+        for key_id, options in getattr(settings, "PLUGHUB_API_KEYS", {}).items():
+            digest = options.get("key_sha256") or (hash_key(options["key"]) if options.get("key") else "")
+            if not digest:
+                continue
+            endpoints = options.get("endpoints")
+            keys.append(
+                ApiKey(
+                    key_id=key_id,
+                    digest=digest.lower(),
+                    endpoints=frozenset(endpoints) if endpoints is not None else None,
+                    rate_limits=dict(options.get("rate_limits") or {}),
+                )
+            )
+        # Plain key lists from older deployments get positional IDs.
+        for index, raw_key in enumerate(getattr(settings, "PLUGHUB_ALLOWED_API_KEYS", []), start=1):
+            if raw_key:
+                keys.append(ApiKey(key_id=f"key-{index}", digest=hash_key(raw_key)))
+        return cls(keys)
+
+    def resolve(self, raw_key):
+        """Return the ApiKey for a supplied raw key, or None."""
+        if not raw_key:
+            return None
+        digest = hash_key(raw_key)
+        key = self._by_digest.get(digest)
+        if key is None or not hmac.compare_digest(key.digest, digest):
+            return None
+        return key
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ApiKeyRegistry.from_settings()
+    return _registry
+
+
+@receiver(setting_changed)
+def _reset_registry(setting, **kwargs):
+    global _registry
+    if setting in ("PLUGHUB_API_KEYS", "PLUGHUB_ALLOWED_API_KEYS"):
+        with _registry_lock:
+            _registry = None
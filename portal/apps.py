@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class PortalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portal'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import status_cache
+        from .apikeys import get_registry
+        from .models import CustomerSubscription
+
+        # Build the API key registry once at startup rather than on the first request.
+        get_registry()
+
+        post_save.connect(status_cache.subscription_changed, sender=CustomerSubscription)
+        post_delete.connect(status_cache.subscription_changed, sender=CustomerSubscription)
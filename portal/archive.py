@@ -0,0 +1,64 @@
+"""
+Archival of consumed payments.
+
+``license_consume`` only ever acts on unused payments, so payments consumed more than
+``PLUGHUB_PAYMENT_ARCHIVE_AFTER_DAYS`` ago are moved to ``ArchivedPayment`` by ``manage.py
+archive_payments``, keeping ``PaymentRecord`` and its indexes small. Each batch is a
+single statement: the oldest consumed rows are locked with ``FOR UPDATE SKIP LOCKED`` (so
+the job can run alongside live traffic and other archivers), the payment events pointing
+at them are unlinked, and the rows are deleted from the hot table and inserted into the
+archive together.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedPayment, PaymentEvent, PaymentRecord
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+DEFAULT_BATCH_SIZE = 1000
+
+
+def archive_cutoff(days=None):
+    """Payments consumed before this moment are due for archiving."""
+    if days is None:
+        days = getattr(settings, "PLUGHUB_PAYMENT_ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS)
+    return timezone.now() - timedelta(days=days)
+
+
+def pending_count(before):
+    return PaymentRecord.objects.filter(used=True, date_consumed__lt=before).count()
+
+
+def archive_batch(before, batch_size=DEFAULT_BATCH_SIZE):
+    """Move up to ``batch_size`` payments consumed before ``before``. Returns how many moved."""
+    quote = connection.ops.quote_name
+    hot = quote(PaymentRecord._meta.db_table)
+    events = quote(PaymentEvent._meta.db_table)
+    archive = quote(ArchivedPayment._meta.db_table)
+    columns = ", ".join(
+        quote(field.column) for field in ArchivedPayment._meta.concrete_fields if field.name != "archived_at"
+    )
+    sql = (
+        f'WITH due AS (SELECT "id" FROM {hot} WHERE "used" AND "date_consumed" < %s '
+        'ORDER BY "date_consumed" LIMIT %s FOR UPDATE SKIP LOCKED), '
+        f'unlinked AS (UPDATE {events} SET "payment_id" = NULL WHERE "payment_id" IN (SELECT "id" FROM due)), '
+        f'moved AS (DELETE FROM {hot} WHERE "id" IN (SELECT "id" FROM due) RETURNING {columns}) '
+        f'INSERT INTO {archive} ({columns}, "archived_at") SELECT {columns}, %s FROM moved'
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, [before, batch_size, timezone.now()])
+        return cursor.rowcount
+
+
+def archive_consumed(before, batch_size=DEFAULT_BATCH_SIZE):
+    """Archive every payment consumed before ``before``, batch by batch. Returns the total."""
+    total = 0
+    while True:
+        moved = archive_batch(before, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
@@ -0,0 +1,130 @@
+"""
+Async variants of the single-item API endpoints, enabled with ``PLUGHUB_ASYNC_API``.
+
+They share validation, authentication and response shapes with ``portal.views``. The
+hot paths (key check, rate limit, status cache, subscription lookup, queueing a webhook
+delivery) stay on the event loop through the async cache and ORM APIs; the raw-SQL
+writes and transactional blocks run through ``sync_to_async``, which Django requires for
+``transaction.atomic``.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from . import ingest, payloads, status_cache, throttling
+from .models import CustomerSubscription
+from .views import (
+    ALLOWED_PRODUCTS,
+    _acheck_rate_limit,
+    _check_api_key,
+    _consume_license,
+    _consume_result,
+    _insert_free_subscription,
+    _log_extra,
+    _paymongo_signature_valid,
+    _record_payment,
+    logger,
+    with_rate_limit_headers,
+)
+
+
+@csrf_exempt
+@require_POST
+@payloads.limit_body_size
+@with_rate_limit_headers
+async def check_user_details(request):
+    if not _check_api_key(request, "check_user_details"):
+        logger.warning("Unauthorized API call to check_user_details", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    if not await _acheck_rate_limit(request, "check_user_details"):
+        logger.warning("Rate limit exceeded for check_user_details", extra=_log_extra(request))
+        return JsonResponse({"error": "Rate limit exceeded"}, status=429)
+
+    data, error = payloads.extract_payload(request)
+    if error:
+        return error
+
+    email = (data.get("email") or "").strip().lower()
+    product = (data.get("product") or "").strip().lower()
+
+    if not email or not product:
+        return JsonResponse({"error": "Both email and product are required."}, status=400)
+
+    if ALLOWED_PRODUCTS and product not in ALLOWED_PRODUCTS:
+        return JsonResponse({"error": "Unsupported product."}, status=400)
+
+    cached = await status_cache.aget(product, email)
+    if cached is not None:
+        return JsonResponse({"data": {"status": cached.upper()}})
+
+    existing = await CustomerSubscription.objects.for_product_email(product, email).only("status", "status_text").afirst()
+    if existing:
+        await status_cache.astore(product, email, existing.get_status_display())
+        return JsonResponse({"data": {"status": existing.get_status_display().upper()}})
+
+    status, created = await sync_to_async(_insert_free_subscription)(product, email)
+    return JsonResponse({"data": {"status": status.upper()}}, status=201 if created else 200)
+
+
+@csrf_exempt
+@require_POST
+@payloads.limit_body_size
+@with_rate_limit_headers
+async def log_payments(request):
+    api_key_valid = _check_api_key(request, "log_payments")
+    webhook_verified = not api_key_valid and _paymongo_signature_valid(request)
+    if not (api_key_valid or webhook_verified):
+        logger.warning("Unauthorized API call to log_payments", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    scope = throttling.PAYMONGO_WEBHOOK_SCOPE if webhook_verified else "log_payments"
+    if not await _acheck_rate_limit(request, scope):
+        logger.warning("Rate limit exceeded for log_payments", extra=_log_extra(request))
+        return JsonResponse({"error": "Rate limit exceeded"}, status=429)
+
+    if ingest.accept_fast_enabled():
+        event = await ingest.aenqueue_event(request.body)
+        return JsonResponse({"data": {"queued": True, "event_id": event.id}}, status=202)
+
+    data, error = payloads.extract_payload(request)
+    if error:
+        return error
+
+    values, error = ingest.normalize_payment(data)
+    if error:
+        return JsonResponse({"error": error}, status=400)
+
+    return await sync_to_async(_record_payment)(values)
+
+
+@csrf_exempt
+@require_POST
+@payloads.limit_body_size
+@with_rate_limit_headers
+async def license_consume(request):
+    if not _check_api_key(request, "license_consume"):
+        logger.warning("Unauthorized API call to license_consume", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    if not await _acheck_rate_limit(request, "license_consume"):
+        logger.warning("Rate limit exceeded for license_consume", extra=_log_extra(request))
+        return JsonResponse({"error": "Rate limit exceeded"}, status=429)
+
+    data, error = payloads.extract_payload(request)
+    if error:
+        return error
+
+    product = (data.get("product") or "").strip().lower()
+    reference = (data.get("reference") or "").strip()
+    email = (data.get("email") or "").strip().lower()
+
+    if not product or not reference or not email:
+        return JsonResponse({"error": "Product, reference, and email are required"}, status=400)
+
+    payment, error = await sync_to_async(_consume_license)(product, reference, email)
+    if error:
+        return JsonResponse({"error": error}, status=404)
+    return JsonResponse({"data": _consume_result(payment, email)})
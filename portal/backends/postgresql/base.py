@@ -0,0 +1,20 @@
+"""
+PostgreSQL backend that times connection acquisition (see ``portal.dbtiming``).
+
+Identical to Django's own backend otherwise, so persistent connections, health checks
+and the psycopg 3 pool (``OPTIONS["pool"]``) all behave as documented upstream.
+"""
+
+import time
+
+from django.db.backends.postgresql import base
+
+from portal import dbtiming
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        dbtiming.record_acquire(self.alias, time.perf_counter() - started)
+        return connection
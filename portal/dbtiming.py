@@ -0,0 +1,89 @@
+"""
+Database connection-acquire timing.
+
+``portal.backends.postgresql`` reports how long each new connection took to obtain,
+whether it came from psycopg's pool or a fresh connect. ``DatabaseTimingMiddleware``
+collects those figures per request and logs them on the ``portal.dbtiming`` logger: at
+DEBUG for every request that acquired a connection, and at WARNING when acquiring took
+longer than ``PLUGHUB_DB_SLOW_ACQUIRE_MS``. Requests served on an already-open
+persistent connection record no acquire at all.
+
+Per-process totals are kept for ``/api/metrics/``.
+"""
+
+import contextvars
+import logging
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+DEFAULT_SLOW_ACQUIRE_MS = 100
+
+logger = logging.getLogger(__name__)
+
+_request_timings = contextvars.ContextVar("plughub_db_timings", default=None)
+
+_totals = {"acquires": 0, "acquire_ms_total": 0.0, "acquire_ms_max": 0.0}
+_totals_lock = threading.Lock()
+
+
+def record_acquire(alias, seconds):
+    elapsed_ms = seconds * 1000
+    with _totals_lock:
+        _totals["acquires"] += 1
+        _totals["acquire_ms_total"] += elapsed_ms
+        _totals["acquire_ms_max"] = max(_totals["acquire_ms_max"], elapsed_ms)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((alias, elapsed_ms))
+
+
+def stats():
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["acquire_ms_total"] = round(totals["acquire_ms_total"], 3)
+    totals["acquire_ms_max"] = round(totals["acquire_ms_max"], 3)
+    return totals
+
+
+class DatabaseTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # The list is shared with any sync_to_async threads the request runs code in.
+        token = _request_timings.set([])
+        try:
+            response = self.get_response(request)
+            _log(request, _request_timings.get())
+            return response
+        finally:
+            _request_timings.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_timings.set([])
+        try:
+            response = await self.get_response(request)
+            _log(request, _request_timings.get())
+            return response
+        finally:
+            _request_timings.reset(token)
+
+
+def _log(request, timings):
+    if not timings:
+        return
+    acquire_ms = round(sum(elapsed for _, elapsed in timings), 3)
+    extra = {"path": request.path, "db_acquire_ms": acquire_ms, "db_acquires": len(timings)}
+    if acquire_ms > getattr(settings, "PLUGHUB_DB_SLOW_ACQUIRE_MS", DEFAULT_SLOW_ACQUIRE_MS):
+        logger.warning("Slow database connection acquire: %.1f ms", acquire_ms, extra=extra)
+    else:
+        logger.debug("Database connection acquired in %.1f ms", acquire_ms, extra=extra)
@@ -0,0 +1,133 @@
+"""
+Block-reserving allocator for customer external IDs (``PRE-NNNN``).
+
+Numbers come from one ``ExternalIdCounter`` row per prefix. Each process reserves a
+block of numbers with a single ``UPDATE ... RETURNING`` and hands them out from memory,
+so allocating an ID never probes ``CustomerSubscription`` per ID. IDs can still be typed
+in by hand through the dashboard or the admin, so each newly reserved block is checked
+against existing IDs with one ``IN`` query and the taken numbers are skipped. An ID
+entered by hand after its block was reserved is caught by the unique constraint instead;
+``is_taken_error`` recognizes that case so the caller can retry with a fresh ID. Numbers
+are zero-padded to four digits and simply grow wider past 9999 (``GAC-10000``).
+"""
+
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import CustomerSubscription, ExternalIdCounter
+
+DEFAULT_BLOCK_SIZE = 20
+
+
+def external_id_prefix(product: str) -> str:
+    parts = [p for p in product.split("-") if p]
+    prefix = "".join(p[0].upper() for p in parts)[:3] or product[:3].upper() or "PHB"
+    if len(prefix) < 3:
+        prefix = prefix.ljust(3, "X")
+    return prefix
+
+
+def format_external_id(prefix: str, number: int) -> str:
+    return f"{prefix}-{number:04d}"
+
+
+class ExternalIdAllocator:
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        # Free numbers reserved by this process, per prefix, in allocation order.
+        self._pools = {}
+
+    def get_block_size(self):
+        if self.block_size is not None:
+            return self.block_size
+        return max(1, int(getattr(settings, "PLUGHUB_EXTERNAL_ID_BLOCK_SIZE", DEFAULT_BLOCK_SIZE)))
+
+    def allocate(self, prefix: str) -> str:
+        return self.allocate_many(prefix, 1)[0]
+
+    def allocate_many(self, prefix: str, count: int) -> list:
+        with self._lock:
+            pool = self._pools.get(prefix, [])
+            numbers, self._pools[prefix] = pool[:count], pool[count:]
+
+        while len(numbers) < count:
+            missing = count - len(numbers)
+            size = max(missing, self.get_block_size())
+            first = self._reserve(prefix, size)
+            free = _free_numbers(prefix, range(first, first + size))
+            numbers.extend(free[:missing])
+            spare = free[missing:]
+            if spare:
+                # Only pool the spare numbers once the reservation is durable; if the
+                # surrounding transaction rolls back, the counter does too.
+                transaction.on_commit(lambda spare=spare: self._release(prefix, spare))
+        return [format_external_id(prefix, number) for number in numbers]
+
+    def reset(self):
+        with self._lock:
+            self._pools.clear()
+
+    def _release(self, prefix, spare):
+        with self._lock:
+            self._pools.setdefault(prefix, []).extend(spare)
+
+    def _reserve(self, prefix: str, size: int) -> int:
+        """Reserve ``size`` numbers for ``prefix`` and return the first one."""
+        table = connection.ops.quote_name(ExternalIdCounter._meta.db_table)
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET "last_value" = "last_value" + %s, "updated_at" = %s '
+                'WHERE "prefix" = %s RETURNING "last_value"',
+                [size, now, prefix],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                # First allocation for this prefix: start above any ID already in use.
+                seed = _highest_existing_number(prefix)
+                cursor.execute(
+                    f'INSERT INTO {table} ("prefix", "last_value", "updated_at") '
+                    "VALUES (%s, %s, %s) "
+                    f'ON CONFLICT ("prefix") DO UPDATE SET "last_value" = {table}."last_value" + %s, '
+                    '"updated_at" = EXCLUDED."updated_at" '
+                    'RETURNING "last_value"',
+                    [prefix, seed + size, now, size],
+                )
+                row = cursor.fetchone()
+        return row[0] - size + 1
+
+
+def _free_numbers(prefix: str, numbers) -> list:
+    """``numbers`` minus those whose ID already exists, e.g. because it was entered by hand."""
+    candidates = {format_external_id(prefix, number): number for number in numbers}
+    taken = set(
+        CustomerSubscription.objects.filter(external_id__in=list(candidates)).values_list("external_id", flat=True)
+    )
+    return [number for external_id, number in candidates.items() if external_id not in taken]
+
+
+def is_taken_error(exc) -> bool:
+    """Whether an IntegrityError comes from the unique constraint on ``external_id``."""
+    constraint = getattr(getattr(exc.__cause__, "diag", None), "constraint_name", None) or ""
+    return CustomerSubscription._meta.get_field("external_id").column in constraint
+
+
+def _highest_existing_number(prefix: str) -> int:
+    pattern = re.compile(rf"^{re.escape(prefix)}-(\d+)$")
+    highest = 0
+    existing = CustomerSubscription.objects.filter(external_id__startswith=f"{prefix}-").values_list(
+        "external_id", flat=True
+    )
+    for external_id in existing.iterator():
+        match = pattern.match(external_id)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+allocator = ExternalIdAllocator()
@@ -46,9 +46,7 @@ class CustomerForm(forms.ModelForm):
             "username": forms.TextInput(
                 attrs={"class": "control", "placeholder": "fleet-ops"}
             ),
-            "subscription_type": forms.TextInput(
-                attrs={"class": "control", "placeholder": "Yearly"}
-            ),
+            "subscription_type": forms.Select(attrs={"class": "control"}),
             "status": forms.Select(attrs={"class": "control"}),
         }
         labels = {
@@ -97,7 +95,7 @@ class PaymentForm(forms.ModelForm):
             "amount": forms.NumberInput(attrs={"class": "control", "placeholder": "1200.00", "step": "0.01"}),
             "reference_number": forms.TextInput(attrs={"class": "control", "placeholder": "PM-REF-1234"}),
             "payment_id": forms.TextInput(attrs={"class": "control", "placeholder": "paymongo-id"}),
-            "status": forms.TextInput(attrs={"class": "control", "placeholder": "Paid"}),
+            "status": forms.Select(attrs={"class": "control"}),
             "used": forms.CheckboxInput(attrs={"class": "control checkbox"}),
         }
         labels = {
@@ -0,0 +1,269 @@
+"""
+Payment ingestion shared by ``log_payments`` and the webhook outbox worker.
+
+In accept-fast mode (``PLUGHUB_LOG_PAYMENTS_ACCEPT_FAST``) ``log_payments`` only appends
+the verified raw body to ``PaymentEvent`` and answers 202. ``manage.py
+drain_payment_events`` then ingests pending events in batches: each batch is claimed
+with ``SELECT ... FOR UPDATE SKIP LOCKED`` and written with one upsert keyed on
+``payment_id``, and the events are marked processed in the same transaction, so every
+delivery lands in ``PaymentRecord`` exactly once even with several workers running.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import payloads
+from .models import PaymentEvent, PaymentRecord
+
+REQUIRED_FIELDS = ["name", "email", "amount", "reference", "paymentid", "status"]
+DEFAULT_BATCH_CHUNK_SIZE = 500
+
+
+def accept_fast_enabled():
+    return getattr(settings, "PLUGHUB_LOG_PAYMENTS_ACCEPT_FAST", False)
+
+
+def _text(data, field):
+    """``data[field]`` as stripped text; numbers are taken as text, objects and lists rejected."""
+    value = data.get(field)
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        raise payloads.PayloadError(f"Field {field} must be text")
+    return str(value).strip()
+
+
+def _object(data, field):
+    value = data.get(field)
+    return value if isinstance(value, dict) else {}
+
+
+def parse_paymongo_event(data):
+    """
+    Accepts lowered dict representing PayMongo webhook event envelope.
+    Returns a flattened dict with name, email, amount, reference, paymentid, status, used=False
+    or None if structure is not PayMongo event-like.
+    """
+    # Expect data -> attributes -> data -> attributes...
+    attributes = data.get("attributes") if isinstance(data, dict) else None
+    if not isinstance(attributes, dict):
+        return None
+    inner_data = attributes.get("data")
+    if not isinstance(inner_data, dict):
+        return None
+    pay_attributes = inner_data.get("attributes") if isinstance(inner_data.get("attributes"), dict) else None
+    if pay_attributes is None:
+        return None
+
+    # Extract billing
+    billing = _object(pay_attributes, "billing")
+    email = _text(billing, "email").lower()
+    name = _text(billing, "name")
+
+    # Amount is in cents
+    amount_val = pay_attributes.get("amount")
+    try:
+        amount_php = Decimal(str(amount_val)) / Decimal("100")
+        amount_php = amount_php.quantize(Decimal("0.01"))
+    except (InvalidOperation, TypeError):
+        amount_php = None
+
+    status = _text(pay_attributes, "status")
+
+    # Reference
+    source = _object(pay_attributes, "source")
+    reference = (
+        _text(pay_attributes, "reference_number")
+        or _text(source, "reference_number")
+        or _text(_object(source, "attributes"), "reference_number")
+    )
+
+    payment_id = _text(inner_data, "id")
+
+    if not any([email, name, amount_php, reference, payment_id, status]):
+        return None
+
+    return {
+        "name": name,
+        "email": email,
+        "amount": amount_php,
+        "reference": reference,
+        "paymentid": payment_id,
+        "status": status,
+        "used": False,
+    }
+
+
+def normalize_payment(data):
+    """
+    Map a lowered payload (PayMongo event or flat format) to ``PaymentRecord`` field values.
+    Returns ``(values, error)`` where exactly one of the two is None.
+    """
+    try:
+        # Detect PayMongo event payload and map it
+        if data.get("type") == "event" or ("attributes" in data and isinstance(data.get("attributes"), dict)):
+            mapped = parse_paymongo_event(data)
+            if mapped:
+                data = mapped
+        fields = {field: _text(data, field) for field in REQUIRED_FIELDS}
+    except payloads.PayloadError as exc:
+        return None, str(exc)
+
+    # Fallback: if reference is missing but paymentid exists, reuse paymentid as reference
+    if not fields["reference"]:
+        fields["reference"] = fields["paymentid"]
+
+    missing = [field for field in REQUIRED_FIELDS if not fields[field]]
+    if missing:
+        return None, f"Missing fields: {', '.join(missing)}"
+
+    try:
+        amount_val = Decimal(fields["amount"]).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None, "Amount must be a valid number"
+
+    # Unknown statuses are stored as OTHER with the text kept, and every status reads back
+    # exactly as it was sent.
+    status, status_text = PaymentRecord.Status.coded(fields["status"])
+
+    return {
+        "name": fields["name"],
+        "email": fields["email"].lower(),
+        "amount": amount_val,
+        "reference_number": fields["reference"],
+        "payment_id": fields["paymentid"],
+        "status": status,
+        "status_text": status_text,
+        "used": False,
+    }, None
+
+
+def write_payments(values_list):
+    """
+    Upsert payments keyed on ``payment_id`` and return ``{payment_id: (record, error)}``.
+    The whole chunk goes out as one ``bulk_upsert_by_payment_id`` (an UPDATE and an
+    INSERT); if a reference number collides with another payment, the chunk is retried
+    row by row so only the offending items fail.
+    """
+    rank = PaymentRecord.STATUS_PROGRESS.get
+    unique = {}
+    for values in values_list:
+        # One statement cannot update the same row twice. Keep the delivery the status
+        # guard would let through last: the furthest along, the latest among equals.
+        kept = unique.get(values["payment_id"])
+        if kept is None or rank(values["status"], 0) >= rank(kept["status"], 0):
+            unique[values["payment_id"]] = values
+    if not unique:
+        return {}
+
+    try:
+        with transaction.atomic():
+            records = PaymentRecord.objects.bulk_upsert_by_payment_id(list(unique.values()))
+        return {record.payment_id: (record, None) for record in records}
+    except IntegrityError:
+        pass
+
+    results = {}
+    for payment_id, values in unique.items():
+        try:
+            with transaction.atomic():
+                record, _ = PaymentRecord.objects.upsert_by_payment_id(**values)
+            results[payment_id] = (record, None)
+        except IntegrityError:
+            results[payment_id] = (None, "Reference already recorded for another payment")
+    return results
+
+
+def ingest_batch(items, chunk_size=None):
+    """
+    Validate every item up front, then upsert the valid ones chunk by chunk. ``items`` come
+    from ``payloads.decode_items``. Returns one result dict per item, in input order.
+    """
+    chunk_size = chunk_size or getattr(settings, "PLUGHUB_LOG_PAYMENTS_BATCH_CHUNK_SIZE", DEFAULT_BATCH_CHUNK_SIZE)
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if isinstance(item, payloads.PayloadError):
+            results[index] = {"index": index, "error": str(item)}
+            continue
+        values, error = normalize_payment(item)
+        if error:
+            results[index] = {"index": index, "error": error}
+            continue
+        valid.append((index, values))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        written = write_payments([values for _, values in chunk])
+        for index, values in chunk:
+            record, error = written[values["payment_id"]]
+            if error:
+                results[index] = {"index": index, "error": error}
+            else:
+                results[index] = {
+                    "index": index,
+                    "id": record.id,
+                    "paymentid": record.payment_id,
+                    "reference": record.reference_number,
+                    "status": record.get_status_display(),
+                }
+    return results
+
+
+def enqueue_event(raw_body):
+    return PaymentEvent.objects.create(payload=raw_body)
+
+
+async def aenqueue_event(raw_body):
+    return await PaymentEvent.objects.acreate(payload=raw_body)
+
+
+def drain_events(batch_size=100):
+    """Ingest one batch of pending events. Returns ``(processed, failed)``."""
+    with transaction.atomic():
+        events = list(
+            PaymentEvent.objects.filter(processed_at__isnull=True)
+            .order_by("id")
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not events:
+            return 0, 0
+
+        now = timezone.now()
+        pending = []
+        for event in events:
+            event.attempts += 1
+            try:
+                values, error = normalize_payment(payloads.decode(bytes(event.payload)))
+            except payloads.PayloadError as exc:
+                values, error = None, str(exc)
+            if error:
+                event.last_error = error
+                event.processed_at = now
+                continue
+            pending.append((event, values))
+
+        results = write_payments([values for _, values in pending])
+        for event, values in pending:
+            record, error = results[values["payment_id"]]
+            event.payment = record
+            event.last_error = error or ""
+            event.processed_at = now
+
+        PaymentEvent.objects.bulk_update(events, ["attempts", "processed_at", "last_error", "payment"])
+    failed = sum(1 for event in events if event.last_error)
+    return len(events) - failed, failed
+
+
+def queue_stats():
+    """Depth of the pending outbox and the age of its oldest event, for monitoring."""
+    pending = PaymentEvent.objects.filter(processed_at__isnull=True)
+    oldest = pending.order_by("id").values_list("received_at", flat=True).first()
+    return {
+        "depth": pending.count(),
+        "oldest_received_at": oldest.isoformat() if oldest else None,
+        "lag_seconds": round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0,
+    }
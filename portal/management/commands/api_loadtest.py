@@ -0,0 +1,75 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent POSTs at an API endpoint and report throughput and latency percentiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", help="Full endpoint URL, e.g. http://127.0.0.1:8000/api/checkuserdetails/")
+        parser.add_argument("--api-key", default="", help="Value for the X-Api-Key header.")
+        parser.add_argument("--body", default="{}", help="JSON request body.")
+        parser.add_argument("--requests", type=int, default=1000, help="Total number of requests.")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once.")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            body = json.dumps(json.loads(options["body"])).encode("utf-8")
+        except ValueError:
+            raise CommandError("--body must be valid JSON")
+        headers = {"Content-Type": "application/json"}
+        if options["api_key"]:
+            headers["X-Api-Key"] = options["api_key"]
+
+        def send(_):
+            request = urllib.request.Request(options["url"], data=body, headers=headers, method="POST")
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=options["timeout"]) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as exc:
+                status = exc.code
+            except (urllib.error.URLError, OSError):
+                status = "error"
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(send, range(options["requests"])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        summary = {
+            "requests": len(results),
+            "concurrency": options["concurrency"],
+            "seconds": round(elapsed, 3),
+            "throughput_rps": round(len(results) / elapsed, 1) if elapsed else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0,
+            "statuses": {str(status): count for status, count in Counter(status for status, _ in results).items()},
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+            return
+        for name, value in summary.items():
+            self.stdout.write(f"{name:>15}: {value}")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
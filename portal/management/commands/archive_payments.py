@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from portal import archive
+
+
+class Command(BaseCommand):
+    help = "Move payments consumed longer ago than the archive horizon from PaymentRecord to ArchivedPayment."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="Archive payments consumed more than this many days ago (default: PLUGHUB_PAYMENT_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=archive.DEFAULT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many payments are due.")
+
+    def handle(self, *args, **options):
+        before = archive.archive_cutoff(options["older_than_days"])
+        if options["dry_run"]:
+            count = archive.pending_count(before)
+            self.stdout.write(f"{count} payment(s) consumed before {before:%Y-%m-%d %H:%M} are due for archiving.")
+            return
+
+        moved = archive.archive_consumed(before, batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Archived {moved} payment(s) consumed before {before:%Y-%m-%d %H:%M}.")
+        )
@@ -0,0 +1,79 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from .api_loadtest import percentile
+
+MODES = ("new", "persistent", "pool")
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a request-sized database round trip (acquire a connection, SELECT 1, release) "
+        "with a new connection per request, a persistent connection, and psycopg's pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--iterations", type=int, default=500)
+        parser.add_argument("--mode", choices=MODES, action="append", help="Repeatable; defaults to every mode.")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        base_settings = connections[options["database"]].settings_dict
+        if base_settings["ENGINE"] not in ("django.db.backends.postgresql", "portal.backends.postgresql"):
+            raise CommandError("The benchmark needs a PostgreSQL database.")
+
+        summary = {}
+        for mode in options["mode"] or MODES:
+            summary[mode] = self._run(base_settings, mode, options["iterations"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+            return
+        for mode, result in summary.items():
+            self.stdout.write(f"{mode:>10}: " + ", ".join(f"{name}={value}" for name, value in result.items()))
+
+    def _run(self, base_settings, mode, iterations):
+        settings_dict = {**base_settings, "OPTIONS": dict(base_settings["OPTIONS"])}
+        settings_dict["OPTIONS"].pop("pool", None)
+        settings_dict["CONN_MAX_AGE"] = None if mode == "persistent" else 0
+        if mode == "pool":
+            settings_dict["OPTIONS"]["pool"] = base_settings["OPTIONS"].get("pool") or True
+
+        alias = f"benchmark_{mode}"
+        wrapper = load_backend(settings_dict["ENGINE"]).DatabaseWrapper(settings_dict, alias)
+        # connection_created receivers (django.contrib.postgres) look the alias up again.
+        connections[alias] = wrapper
+        timings = []
+        try:
+            # Warm up so the pool is open and the persistent connection exists.
+            self._round_trip(wrapper, mode)
+            for _ in range(iterations):
+                started = time.perf_counter()
+                self._round_trip(wrapper, mode)
+                timings.append(time.perf_counter() - started)
+        finally:
+            wrapper.close()
+            if mode == "pool":
+                wrapper.close_pool()
+            del connections[alias]
+
+        timings.sort()
+        return {
+            "iterations": iterations,
+            "p50_ms": round(percentile(timings, 50) * 1000, 3),
+            "p99_ms": round(percentile(timings, 99) * 1000, 3),
+            "max_ms": round(timings[-1] * 1000, 3) if timings else 0,
+        }
+
+    def _round_trip(self, wrapper, mode):
+        with wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        if mode != "persistent":
+            # What request_finished does for non-persistent connections; pooled ones go back to the pool.
+            wrapper.close()
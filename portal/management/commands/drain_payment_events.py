@@ -0,0 +1,36 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from portal import ingest
+
+
+class Command(BaseCommand):
+    help = "Ingest queued log_payments deliveries into PaymentRecord."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep polling instead of exiting when the queue is empty.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep between polls with --loop.")
+        parser.add_argument("--stats", action="store_true", help="Print queue depth and lag as JSON and exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self.stdout.write(json.dumps(ingest.queue_stats()))
+            return
+
+        total_processed = total_failed = 0
+        while True:
+            processed, failed = ingest.drain_events(batch_size=options["batch_size"])
+            total_processed += processed
+            total_failed += failed
+            if processed or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Ingested {total_processed} event(s); {total_failed} failed.")
+        )
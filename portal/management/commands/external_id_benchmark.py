@@ -0,0 +1,128 @@
+import json
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from portal.external_ids import ExternalIdAllocator, format_external_id
+from portal.models import CustomerSubscription, ExternalIdCounter
+
+from .api_loadtest import percentile
+
+# The prefix space the benchmark fills; --cleanup removes its rows and counter.
+BENCH_PREFIX = "ZBM"
+BENCH_PRODUCT = "external-id-benchmark"
+# The old generator drew four random digits, so its space held 10,000 IDs.
+LEGACY_SPACE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill one external ID prefix step by step and time ID allocation at each fill level, "
+        "for the block allocator and for the old random-digits-and-probe generator."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fill", type=int, default=12000, help="IDs to insert in total.")
+        parser.add_argument("--step", type=int, default=1000, help="IDs inserted between measurements.")
+        parser.add_argument("--samples", type=int, default=200, help="Timed allocations per fill level.")
+        parser.add_argument("--block-size", type=int, default=None, help="Allocator block size (default: setting).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--cleanup", action="store_true", help="Delete the benchmark rows and counter and exit.")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        # Start from an empty prefix; leftovers of an interrupted run would skew the levels.
+        deleted = self._cleanup()
+        if options["cleanup"]:
+            self.stdout.write(f"Deleted {deleted} subscription(s).")
+            return
+
+        rng = random.Random(options["seed"])
+        allocator = ExternalIdAllocator(block_size=options["block_size"])
+        summary = []
+        filled = 0
+        while True:
+            timings = []
+            allocated = []
+            for _ in range(options["samples"]):
+                started = time.perf_counter()
+                allocated.append(allocator.allocate(BENCH_PREFIX))
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            level = {
+                "filled": filled,
+                "allocator_p50_us": round(percentile(timings, 50) * 1e6, 1),
+                "allocator_p99_us": round(percentile(timings, 99) * 1e6, 1),
+            }
+            if filled < LEGACY_SPACE:
+                level.update(self._time_legacy(rng, options["samples"]))
+            summary.append(level)
+            if not options["json"]:
+                self.stdout.write(self._format(level))
+
+            if filled >= options["fill"]:
+                break
+            batch = max(0, min(options["step"], options["fill"] - filled) - len(allocated))
+            allocated.extend(allocator.allocate_many(BENCH_PREFIX, batch))
+            self._insert(allocated)
+            filled += len(allocated)
+
+        self._cleanup()
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+
+    def _cleanup(self):
+        deleted, _ = CustomerSubscription.objects.filter(external_id__startswith=f"{BENCH_PREFIX}-").delete()
+        ExternalIdCounter.objects.filter(prefix=BENCH_PREFIX).delete()
+        return deleted
+
+    def _time_legacy(self, rng, samples):
+        """Time the pre-allocator generator: random four digits, one exists() probe per draw."""
+        timings = []
+        probes = 0
+        for _ in range(samples):
+            started = time.perf_counter()
+            while True:
+                probes += 1
+                candidate = f"{BENCH_PREFIX}-" + "".join(rng.choice(string.digits) for _ in range(4))
+                if not CustomerSubscription.objects.filter(external_id=candidate).exists():
+                    break
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return {
+            "legacy_p50_us": round(percentile(timings, 50) * 1e6, 1),
+            "legacy_p99_us": round(percentile(timings, 99) * 1e6, 1),
+            "legacy_probes_per_id": round(probes / samples, 2),
+        }
+
+    def _insert(self, external_ids):
+        now = timezone.now()
+        CustomerSubscription.objects.bulk_create(
+            [
+                CustomerSubscription(
+                    external_id=external_id,
+                    product=BENCH_PRODUCT,
+                    email=f"{external_id.lower()}@bench.invalid",
+                    username="",
+                    last_login=now,
+                    subscription_type=CustomerSubscription.SubscriptionType.MONTHLY,
+                    status=CustomerSubscription.Status.FREE,
+                )
+                for external_id in external_ids
+            ]
+        )
+
+    def _format(self, level):
+        line = (
+            f"filled={level['filled']:>6} ({format_external_id(BENCH_PREFIX, level['filled'])}) "
+            f"allocator p50={level['allocator_p50_us']}us p99={level['allocator_p99_us']}us"
+        )
+        if "legacy_p50_us" in level:
+            line += (
+                f"  legacy p50={level['legacy_p50_us']}us p99={level['legacy_p99_us']}us "
+                f"probes/id={level['legacy_probes_per_id']}"
+            )
+        return line
@@ -0,0 +1,98 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+
+from portal import ingest, payloads
+
+from .api_loadtest import percentile
+from .webhook_signature_benchmark import DEFAULT_SIZES, paymongo_event
+
+
+def legacy_lower_dict_keys(data):
+    if not isinstance(data, dict):
+        return {}
+    return {str(k).lower(): v for k, v in data.items()}
+
+
+def legacy_extract(raw):
+    """Parsing before portal.payloads: decode to str, json.loads, then two lowercased copies."""
+    payload = json.loads(raw.decode("utf-8") or "{}")
+    lowered = legacy_lower_dict_keys(payload)
+    data_obj = lowered.get("data")
+    if isinstance(data_obj, dict):
+        return legacy_lower_dict_keys(data_obj)
+    return lowered
+
+
+def stdlib_decode(raw):
+    """payloads.decode with the stdlib json fallback, as when orjson is not installed."""
+    return payloads.select_data(json.loads(raw or b"{}"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Time parsing PayMongo event envelopes of several sizes into the object the API views "
+        "read (old path, portal.payloads with the stdlib and with orjson), and serializing the "
+        "log_payments response."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default=DEFAULT_SIZES, help=f"Comma-separated body sizes in bytes (default: {DEFAULT_SIZES})."
+        )
+        parser.add_argument("--iterations", type=int, default=2000, help="Timed runs per size and path.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of byte counts.")
+
+        paths = {"legacy": legacy_extract, "stdlib": stdlib_decode}
+        if payloads.orjson is not None:
+            paths["orjson"] = payloads.decode
+        elif not options["json"]:
+            self.stdout.write("orjson is not installed; timing the stdlib paths only.")
+
+        rng = random.Random(options["seed"])
+        summary = []
+        for size in sizes:
+            body = paymongo_event(rng, 0, size)
+            expected = ingest.normalize_payment(legacy_extract(body))
+            result = {"bytes": len(body)}
+            for name, parse in paths.items():
+                # Every path must hand the views the same payment.
+                if ingest.normalize_payment(parse(body)) != expected:
+                    raise CommandError(f"{name} parsed the {len(body)}-byte envelope differently from the old path.")
+                result.update(self._time(name, lambda: parse(body), options["iterations"]))
+            values, _ = expected
+            response = {"data": {"id": 1, "reference": values["reference_number"], "status": "paid", "used": False}}
+            result.update(self._time("response", lambda: JsonResponse(response, status=201), options["iterations"]))
+            summary.append(result)
+            if not options["json"]:
+                self.stdout.write(self._format(result, [*paths, "response"]))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+
+    def _time(self, name, run, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return {
+            f"{name}_p50_us": round(percentile(timings, 50) * 1e6, 1),
+            f"{name}_p99_us": round(percentile(timings, 99) * 1e6, 1),
+        }
+
+    def _format(self, result, names):
+        return f"{result['bytes']:>9} bytes: " + "  ".join(
+            f"{name} p50={result[f'{name}_p50_us']}us p99={result[f'{name}_p99_us']}us" for name in names
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from portal import partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly PaymentRecord partitions and retire months past the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=None,
+            help="Make partitions this many months past the current one (default: PLUGHUB_PAYMENT_PARTITION_MONTHS_AHEAD).",
+        )
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            default=None,
+            help="Drop or detach months older than this; 0 keeps all (default: PLUGHUB_PAYMENT_PARTITION_RETAIN_MONTHS).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        verb = "Would create" if dry_run else "Created"
+        for name, moved in partitions.ensure_partitions(options["months_ahead"], dry_run=dry_run):
+            suffix = f" ({moved} row(s) moved from the default partition)" if moved else ""
+            self.stdout.write(f"{verb} {name}{suffix}.")
+
+        for name, action in partitions.retire_partitions(options["retain_months"], dry_run=dry_run):
+            if action == "kept":
+                self.stdout.write(self.style.WARNING(f"Kept {name}: it still holds unused payments."))
+            else:
+                verb = {"dropped": "drop", "detached": "detach"}[action]
+                self.stdout.write(f"Would {verb} {name}." if dry_run else f"{action.capitalize()} {name}.")
+
+        attached = partitions.attached_partitions()
+        stray = partitions.default_partition_rows()
+        summary = f"{len(attached)} monthly partition(s) attached; {stray} row(s) in the default partition."
+        self.stdout.write(self.style.WARNING(summary) if stray else self.style.SUCCESS(summary))
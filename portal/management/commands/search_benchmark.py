@@ -0,0 +1,185 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from portal import search
+from portal.models import CustomerSubscription, PaymentRecord
+
+from .api_loadtest import percentile
+
+# Seeded rows carry this marker so --cleanup can remove exactly them.
+BENCH_PREFIX = "BENCH"
+FIRST_NAMES = ["ana", "ben", "carla", "dante", "elle", "fritz", "gina", "hugo", "ines", "jose", "kara", "leo"]
+LAST_NAMES = ["reyes", "santos", "cruz", "bautista", "garcia", "mendoza", "torres", "flores", "ramos", "lopez"]
+PRODUCTS = ["gmail-addon-cleaner", "plughub-ims", "plughub-queueing"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic subscriptions and payments (deterministically) and time the dashboard "
+        "search for each query route (identifier, prefix, email and free text)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Rows to seed per table.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per search term.")
+        parser.add_argument(
+            "--skip-seed", action="store_true", help="Reuse rows seeded by an earlier run instead of reseeding."
+        )
+        parser.add_argument("--cleanup", action="store_true", help="Delete the seeded rows and exit.")
+        parser.add_argument("--explain", action="store_true", help="Print the query plan for each term.")
+        parser.add_argument(
+            "--verify", action="store_true", help="Check that each routed result also matches the broad substring search."
+        )
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        if options["cleanup"] or not options["skip_seed"]:
+            # Reseed from an empty prefix, so rows left by an earlier run never skew the numbers.
+            deleted_subs, deleted_pays = self._delete_seeded()
+            if options["cleanup"]:
+                self.stdout.write(f"Deleted {deleted_subs} subscription(s) and {deleted_pays} payment(s).")
+                return
+
+        rng = random.Random(options["seed"])
+        if not options["skip_seed"]:
+            self._seed(rng, options["rows"], options["batch_size"])
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {CustomerSubscription._meta.db_table}")
+                cursor.execute(f"ANALYZE {PaymentRecord._meta.db_table}")
+
+        rows = {
+            "subscriptions": self._seeded(CustomerSubscription).count(),
+            "payments": self._seeded(PaymentRecord).count(),
+        }
+        if not all(rows.values()):
+            raise CommandError("No seeded rows to search; run without --skip-seed first.")
+        if not options["json"]:
+            self.stdout.write(f"Searching {rows['subscriptions']} subscription(s) and {rows['payments']} payment(s).")
+
+        sample = rng.randrange(min(rows.values()))
+        terms = {
+            "subscriptions": [
+                f"{BENCH_PREFIX}-{sample:07d}",
+                f"{BENCH_PREFIX}-{sample:07d}"[:-4],
+                _email(sample),
+                _username(sample)[:-2],
+                "zz-no-match",
+            ],
+            "payments": [
+                f"pay_{BENCH_PREFIX}{sample:07d}",
+                f"pay_{BENCH_PREFIX}{sample:07d}"[:-2],
+                f"{BENCH_PREFIX}REF{sample:07d}",
+                _email(sample),
+                f"REF{sample:07d}"[:-2],
+                "zz-no-match",
+            ],
+        }
+
+        summary = {"rows": rows}
+        for table, table_terms in terms.items():
+            for term in table_terms:
+                timings = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    queryset, route = self._search(table, term)
+                    list(queryset[:6])
+                    timings.append(time.perf_counter() - started)
+                timings.sort()
+                result = {
+                    "route": route,
+                    "p50_ms": round(percentile(timings, 50) * 1000, 3),
+                    "p99_ms": round(percentile(timings, 99) * 1000, 3),
+                }
+                if options["verify"]:
+                    result["within_free_text"] = self._within_free_text(table, term, queryset)
+                summary[f"{table}:{term}"] = result
+                if options["explain"]:
+                    self.stdout.write(f"-- {table}: {term} ({route})\n{queryset[:6].explain()}\n")
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+            return
+        for name, result in summary.items():
+            if name == "rows":
+                continue
+            line = f"{name:>48}: {result['route']:<24} p50={result['p50_ms']}ms p99={result['p99_ms']}ms"
+            if "within_free_text" in result:
+                line += f" within_free_text={result['within_free_text']}"
+            self.stdout.write(line)
+
+    def _seeded(self, model):
+        if model is CustomerSubscription:
+            return model.objects.filter(external_id__startswith=f"{BENCH_PREFIX}-")
+        return model.objects.filter(payment_id__startswith=f"pay_{BENCH_PREFIX}")
+
+    def _delete_seeded(self):
+        deleted_subs, _ = self._seeded(CustomerSubscription).delete()
+        deleted_pays, _ = self._seeded(PaymentRecord).delete()
+        return deleted_subs, deleted_pays
+
+    def _search(self, table, term):
+        if table == "subscriptions":
+            queryset, route = search.search_subscriptions(CustomerSubscription.objects.all(), term)
+            return queryset.order_by("external_id"), route
+        queryset, route = search.search_payments(PaymentRecord.objects.all(), term)
+        return queryset.order_by("-created_at", "-id"), route
+
+    def _within_free_text(self, table, term, queryset):
+        """Whether every row the routed plan returned also matches the broad icontains search."""
+        if table == "subscriptions":
+            model, fields, code_fields = (
+                CustomerSubscription, search.SUBSCRIPTION_SEARCH_FIELDS, search.SUBSCRIPTION_CODE_FIELDS
+            )
+        else:
+            model, fields, code_fields = PaymentRecord, search.PAYMENT_SEARCH_FIELDS, search.PAYMENT_CODE_FIELDS
+        broad = model.objects.filter(search._contains_any(fields, term, code_fields))
+        return set(queryset.values_list("pk", flat=True)) <= set(broad.values_list("pk", flat=True))
+
+    def _seed(self, rng, rows, batch_size):
+        now = timezone.now()
+        for start in range(0, rows, batch_size):
+            stop = min(rows, start + batch_size)
+            subscriptions = [
+                CustomerSubscription(
+                    external_id=f"{BENCH_PREFIX}-{n:07d}",
+                    product=rng.choice(PRODUCTS),
+                    email=_email(n),
+                    username=_username(n),
+                    last_login=now,
+                    subscription_type=rng.choice(CustomerSubscription.SubscriptionType.values),
+                    status=rng.choice(CustomerSubscription.Status.values),
+                )
+                for n in range(start, stop)
+            ]
+            payments = [
+                PaymentRecord(
+                    name=f"{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}",
+                    amount=Decimal(rng.randrange(100, 100000)) / 100,
+                    reference_number=f"{BENCH_PREFIX}REF{n:07d}",
+                    payment_id=f"pay_{BENCH_PREFIX}{n:07d}",
+                    status=rng.choice(PaymentRecord.Status.values),
+                    email=_email(n),
+                )
+                for n in range(start, stop)
+            ]
+            with transaction.atomic():
+                CustomerSubscription.objects.bulk_create(subscriptions)
+                PaymentRecord.objects.bulk_create(payments)
+            self.stdout.write(f"Seeded {stop}/{rows}", ending="\r")
+        self.stdout.write("")
+
+
+def _username(n):
+    return f"{FIRST_NAMES[n % len(FIRST_NAMES)]}{LAST_NAMES[n % len(LAST_NAMES)]}{n}"
+
+
+def _email(n):
+    return f"{_username(n)}@example.com"
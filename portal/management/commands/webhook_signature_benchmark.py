@@ -0,0 +1,147 @@
+import hashlib
+import hmac
+import json
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from portal import paymongo
+
+from .api_loadtest import percentile
+
+BENCH_SECRET = "whsk_benchmark"
+DEFAULT_SIZES = "1024,65536,1048576"
+
+
+def paymongo_event(rng, index, size=0):
+    """A ``payment.paid`` event envelope as PayMongo sends it, padded to about ``size`` bytes."""
+    payment_id = "pay_" + "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(24))
+    event = {
+        "data": {
+            "id": f"evt_{payment_id[4:]}",
+            "type": "event",
+            "attributes": {
+                "type": "payment.paid",
+                "livemode": False,
+                "created_at": 1700000000 + index,
+                "data": {
+                    "id": payment_id,
+                    "type": "payment",
+                    "attributes": {
+                        "amount": rng.choice([19900, 49900, 99900]),
+                        "currency": "PHP",
+                        "description": "Gmail Addon Cleaner license",
+                        "status": "paid",
+                        "fee": 1250,
+                        "billing": {
+                            "name": "Ana Reyes",
+                            "email": f"Customer{index}@Example.com",
+                            "phone": "+639170000000",
+                            "address": {"city": "Makati", "country": "PH", "postal_code": "1200"},
+                        },
+                        "source": {
+                            "id": f"src_{payment_id[4:]}",
+                            "type": "gcash",
+                            "reference_number": f"REF{index:08d}",
+                        },
+                        "metadata": {},
+                    },
+                },
+            },
+        }
+    }
+    raw = json.dumps(event).encode()
+    if size > len(raw):
+        # PayMongo echoes merchant metadata back; pad there so the envelope stays realistic.
+        metadata = event["data"]["attributes"]["data"]["attributes"]["metadata"]
+        metadata["notes"] = "".join(rng.choice(string.ascii_letters) for _ in range(size - len(raw) - 11))
+        raw = json.dumps(event).encode()
+    return raw
+
+
+def sign(secret, timestamp, raw_body):
+    digest = hmac.new(secret.encode(), timestamp.encode() + b"." + raw_body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def legacy_verify(secret, header, raw_body):
+    """Verification before portal.paymongo: decode the body, format a str, encode it again, MAC it."""
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+    except ValueError:
+        return False
+    timestamp, provided_sig = parts.get("t"), parts.get("v1")
+    if not timestamp or not provided_sig:
+        return False
+    signed_string = f"{timestamp}.{raw_body.decode('utf-8', errors='replace')}"
+    expected = hmac.new(secret.encode("utf-8"), signed_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, provided_sig)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time PayMongo webhook signature verification over payloads of several sizes, for "
+        "portal.paymongo.verify_signature and for the old decode/re-encode path."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default=DEFAULT_SIZES, help=f"Comma-separated body sizes in bytes (default: {DEFAULT_SIZES})."
+        )
+        parser.add_argument("--iterations", type=int, default=2000, help="Timed verifications per size and path.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma-separated list of byte counts.")
+
+        rng = random.Random(options["seed"])
+        timestamp = str(int(time.time()))
+        summary = []
+        # Sign and verify with a known secret, whatever the environment configures.
+        with override_settings(PAYMONGO_WEBHOOK_SECRET=BENCH_SECRET, PAYMONGO_WEBHOOK_SECRETS=[]):
+            for size in sizes:
+                body = paymongo_event(rng, 0, size)
+                header = sign(BENCH_SECRET, timestamp, body)
+                paths = {
+                    "verify_signature": lambda: paymongo.verify_signature(header, body, now=int(timestamp)),
+                    "legacy": lambda: legacy_verify(BENCH_SECRET, header, body),
+                }
+                result = {"bytes": len(body)}
+                for name, verify in paths.items():
+                    if not verify():
+                        raise CommandError(f"{name} rejected a correctly signed {len(body)}-byte body.")
+                    result.update(self._time(name, verify, options["iterations"], len(body)))
+                summary.append(result)
+                if not options["json"]:
+                    self.stdout.write(self._format(result))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+
+    def _time(self, name, verify, iterations, size):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            verify()
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        p50 = percentile(timings, 50)
+        return {
+            f"{name}_p50_us": round(p50 * 1e6, 1),
+            f"{name}_p99_us": round(percentile(timings, 99) * 1e6, 1),
+            f"{name}_mb_per_s": round(size / p50 / 1e6, 1) if p50 else 0,
+        }
+
+    def _format(self, result):
+        return f"{result['bytes']:>9} bytes: " + "  ".join(
+            f"{name} p50={result[f'{name}_p50_us']}us p99={result[f'{name}_p99_us']}us "
+            f"({result[f'{name}_mb_per_s']} MB/s)"
+            for name in ("verify_signature", "legacy")
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:06
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def normalize_customers(apps, schema_editor):
+    Customer = apps.get_model("portal", "CustomerSubscription")
+    Customer.objects.update(product=Trim("product"), email=Lower(Trim("email")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_paymentrecord_date_consumed'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_customers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customersubscription',
+            index=models.Index(django.db.models.functions.text.Lower('product'), django.db.models.functions.text.Lower('email'), name='portal_sub_product_email_ci'),
+        ),
+    ]
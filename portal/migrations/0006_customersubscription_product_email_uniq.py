@@ -0,0 +1,98 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:06
+"""
+Make (product, email) unique, case-insensitively.
+
+Rows that would break the constraint are not deleted: one row per normalized pair is
+kept, and the others move to the ``portal_customersubscription_duplicates`` table for
+review. Each group is logged at WARNING on this module's logger. Unapplying the
+migration moves the rows back and drops the table.
+"""
+
+import logging
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+logger = logging.getLogger(__name__)
+
+STATUS_PRIORITY = {"Paid": 0, "In Arrears": 1, "Free": 2}
+# Duplicates the unique constraint would reject are moved here, not deleted.
+DUPLICATES_TABLE = "portal_customersubscription_duplicates"
+
+
+def dedupe_customers(apps, schema_editor):
+    """
+    Keep one row per normalized (product, email), preferring Paid, then the oldest. The
+    other rows are moved to DUPLICATES_TABLE with their IDs, so they can be reviewed and
+    merged by hand; unapplying this migration moves them back.
+    """
+    Customer = apps.get_model("portal", "CustomerSubscription")
+    duplicates = (
+        Customer.objects.annotate(product_ci=Lower("product"), email_ci=Lower("email"))
+        .values("product_ci", "email_ci")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    moved = []
+    for group in duplicates:
+        rows = list(
+            Customer.objects.annotate(product_ci=Lower("product"), email_ci=Lower("email"))
+            .filter(product_ci=group["product_ci"], email_ci=group["email_ci"])
+            .values_list("id", "external_id", "status")
+        )
+        rows.sort(key=lambda row: (STATUS_PRIORITY.get(row[2], len(STATUS_PRIORITY)), row[0]))
+        kept, extra = rows[0], rows[1:]
+        moved.extend(row[0] for row in extra)
+        logger.warning(
+            "%s / %s: keeping %s (%s), moving %s",
+            group["product_ci"],
+            group["email_ci"],
+            kept[1],
+            kept[2],
+            ", ".join(f"{external_id} ({status})" for _, external_id, status in extra),
+        )
+    if not moved:
+        return
+    quote = schema_editor.quote_name
+    table = quote(Customer._meta.db_table)
+    schema_editor.execute(f"CREATE TABLE {quote(DUPLICATES_TABLE)} (LIKE {table} INCLUDING DEFAULTS)")
+    schema_editor.execute(
+        f"WITH moved AS (DELETE FROM {table} WHERE id = ANY(%s) RETURNING *) "
+        f"INSERT INTO {quote(DUPLICATES_TABLE)} SELECT * FROM moved",
+        [moved],
+    )
+    logger.warning("Moved %d duplicate subscription(s) to %s.", len(moved), DUPLICATES_TABLE)
+
+
+def restore_duplicates(apps, schema_editor):
+    Customer = apps.get_model("portal", "CustomerSubscription")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [DUPLICATES_TABLE])
+        if cursor.fetchone()[0] is None:
+            return
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"INSERT INTO {quote(Customer._meta.db_table)} SELECT * FROM {quote(DUPLICATES_TABLE)}"
+    )
+    schema_editor.execute(f"DROP TABLE {quote(DUPLICATES_TABLE)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0005_customersubscription_product_email_ci'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_customers, restore_duplicates),
+        migrations.AddConstraint(
+            model_name='customersubscription',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('product'), django.db.models.functions.text.Lower('email'), name='portal_sub_product_email_uniq'),
+        ),
+        migrations.RemoveIndex(
+            model_name='customersubscription',
+            name='portal_sub_product_email_ci',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_customersubscription_product_email_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalIdCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'external ID counter',
+                'verbose_name_plural': 'external ID counters',
+            },
+        ),
+    ]
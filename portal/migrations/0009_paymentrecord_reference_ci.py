@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0008_paymentevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(django.db.models.functions.text.Lower('reference_number'), name='portal_pay_reference_ci'),
+        ),
+    ]
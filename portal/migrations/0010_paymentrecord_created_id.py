@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0009_paymentrecord_reference_ci'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(fields=['-created_at', '-id'], name='portal_pay_created_id'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:27
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0010_paymentrecord_created_id'),
+    ]
+
+    operations = [
+        # pg_trgm is a trusted extension (PostgreSQL 13+), so the app's role can create it.
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddIndex(
+            model_name='customersubscription',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='portal_sub_email_ci'),
+        ),
+        migrations.AddIndex(
+            model_name='customersubscription',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('external_id'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('product'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('subscription_type'), name='gin_trgm_ops'), name='portal_sub_search_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='portal_pay_email_ci'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('reference_number'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('payment_id'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('status'), name='gin_trgm_ops'), name='portal_pay_search_trgm'),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:37
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import F, Q
+from django.db.models.functions import Lower, Trim
+
+# The model choices as of this migration, per model and column: {label: code}. Values
+# that are none of these labels get code 0 ("other").
+CODES = {
+    "CustomerSubscription": {
+        "status": {"Paid": 1, "Free": 2, "In Arrears": 3},
+        "subscription_type": {"One-time": 1, "Monthly": 2, "Yearly": 3, "Pilot": 4},
+    },
+    "PaymentRecord": {
+        "status": {"pending": 1, "paid": 2, "failed": 3, "refunded": 4},
+    },
+}
+
+
+def labels_to_codes(apps, schema_editor):
+    """
+    Rewrite each label as its code's digits so the AlterFields below can cast to smallint.
+    A value that is not exactly its label (other casing, stray spaces) or that is no label
+    at all (code 0) is first copied to the column's ``_text`` side column, so nothing the
+    dashboard or the API stored before is lost and it still reads back the same.
+    """
+    for model_name, columns in CODES.items():
+        Model = apps.get_model("portal", model_name)
+        for column, codes in columns.items():
+            rows = Model.objects.alias(value_ci=Lower(Trim(column)))
+            labels = [label.lower() for label in codes]
+            rows.exclude(value_ci__in=labels).update(**{f"{column}_text": Trim(column), column: "0"})
+            for label, code in codes.items():
+                matching = rows.filter(value_ci=label.lower())
+                matching.exclude(**{column: label}).update(**{f"{column}_text": Trim(column)})
+                matching.update(**{column: str(code)})
+
+
+def codes_to_labels(apps, schema_editor):
+    for model_name, columns in CODES.items():
+        Model = apps.get_model("portal", model_name)
+        for column, codes in columns.items():
+            for label, code in codes.items():
+                Model.objects.filter(**{column: str(code), f"{column}_text": ""}).update(**{column: label})
+            Model.objects.filter(~Q(**{f"{column}_text": ""})).update(**{column: F(f"{column}_text")})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0011_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customersubscription',
+            name='portal_sub_search_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='paymentrecord',
+            name='portal_pay_search_trgm',
+        ),
+        migrations.AddField(
+            model_name='customersubscription',
+            name='status_text',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='customersubscription',
+            name='subscription_type_text',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='paymentrecord',
+            name='status_text',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.RunPython(labels_to_codes, codes_to_labels),
+        migrations.AlterField(
+            model_name='customersubscription',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Paid'), (2, 'Free'), (3, 'In Arrears')], default=1),
+        ),
+        migrations.AlterField(
+            model_name='customersubscription',
+            name='subscription_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'One-time'), (2, 'Monthly'), (3, 'Yearly'), (4, 'Pilot')]),
+        ),
+        migrations.AlterField(
+            model_name='paymentrecord',
+            name='status',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'other'), (1, 'pending'), (2, 'paid'), (3, 'failed'), (4, 'refunded')]),
+        ),
+        migrations.AddIndex(
+            model_name='customersubscription',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('external_id'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('product'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('subscription_type_text'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('status_text'), name='gin_trgm_ops'), name='portal_sub_search_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customersubscription',
+            index=models.Index(condition=models.Q(('status', 3)), fields=['external_id'], name='portal_sub_in_arrears'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('reference_number'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('payment_id'), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('status_text'), name='gin_trgm_ops'), name='portal_pay_search_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(condition=models.Q(('used', False)), fields=['-created_at', '-id'], name='portal_pay_unused_created'),
+        ),
+    ]
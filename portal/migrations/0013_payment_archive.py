@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Payment IDs and references that were archived stay taken: inserting or renaming a hot row
+# onto one fails like a unique violation, which the API already reports as a conflict.
+NOT_ARCHIVED_SQL = """
+CREATE FUNCTION portal_payment_not_archived() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM portal_archivedpayment
+        WHERE payment_id = NEW.payment_id OR reference_number = NEW.reference_number
+    ) THEN
+        RAISE unique_violation USING
+            MESSAGE = format('payment %s / reference %s is archived', NEW.payment_id, NEW.reference_number);
+    END IF;
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER portal_payment_not_archived
+    BEFORE INSERT OR UPDATE OF payment_id, reference_number ON portal_paymentrecord
+    FOR EACH ROW EXECUTE FUNCTION portal_payment_not_archived();
+"""
+
+DROP_NOT_ARCHIVED_SQL = """
+DROP TRIGGER IF EXISTS portal_payment_not_archived ON portal_paymentrecord;
+DROP FUNCTION IF EXISTS portal_payment_not_archived();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0012_status_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPayment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=180)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reference_number', models.CharField(max_length=80, unique=True)),
+                ('payment_id', models.CharField(max_length=120, unique=True)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'other'), (1, 'pending'), (2, 'paid'), (3, 'failed'), (4, 'refunded')])),
+                ('status_text', models.CharField(blank=True, default='', max_length=40)),
+                ('email', models.EmailField(max_length=254)),
+                ('date_consumed', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'archived payment',
+                'verbose_name_plural': 'archived payments',
+                'ordering': ['-date_consumed'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(django.db.models.functions.text.Lower('reference_number'), condition=models.Q(('used', False)), name='portal_pay_unused_reference'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentrecord',
+            index=models.Index(condition=models.Q(('used', True)), fields=['date_consumed'], name='portal_pay_consumed_at'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpayment',
+            index=models.Index(django.db.models.functions.text.Lower('reference_number'), name='portal_archpay_reference_ci'),
+        ),
+        migrations.RunSQL(NOT_ARCHIVED_SQL, DROP_NOT_ARCHIVED_SQL),
+    ]
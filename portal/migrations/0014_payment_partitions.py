@@ -0,0 +1,154 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:45
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# PaymentRecord becomes a table range-partitioned by month of created_at. PostgreSQL needs
+# the partition key in every unique index of a partitioned table, so the primary key is
+# (id, created_at), ids come from one shared sequence, and payment_id/reference_number are
+# kept unique across partitions by the PaymentKey rows the portal_payment_keys trigger
+# maintains. The model state still says unique=True for both fields (forms and the admin
+# validate against it); altering them needs hand-written SQL. Requires PostgreSQL 13+.
+# Months are created from the oldest payment to three months ahead; anything outside
+# lands in the default partition until `manage.py payment_partitions` makes its month.
+PARTITION_SQL = """
+ALTER TABLE portal_paymentrecord RENAME TO portal_paymentrecord_unpartitioned;
+ALTER TABLE portal_paymentrecord_unpartitioned ALTER COLUMN id DROP IDENTITY;
+ALTER TABLE portal_paymentrecord_unpartitioned
+    RENAME CONSTRAINT portal_paymentrecord_pkey TO portal_paymentrecord_unpartitioned_pkey;
+DROP TRIGGER portal_payment_not_archived ON portal_paymentrecord_unpartitioned;
+
+CREATE SEQUENCE portal_paymentrecord_id_seq;
+CREATE TABLE portal_paymentrecord (
+    LIKE portal_paymentrecord_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    CONSTRAINT portal_paymentrecord_pkey PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+ALTER TABLE portal_paymentrecord ALTER COLUMN id SET DEFAULT nextval('portal_paymentrecord_id_seq');
+ALTER SEQUENCE portal_paymentrecord_id_seq OWNED BY portal_paymentrecord.id;
+
+CREATE TABLE portal_paymentrecord_default PARTITION OF portal_paymentrecord DEFAULT;
+DO $$
+DECLARE
+    month timestamp := date_trunc('month', coalesce(
+        (SELECT min(created_at) FROM portal_paymentrecord_unpartitioned), now()) AT TIME ZONE 'UTC');
+    last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months';
+BEGIN
+    WHILE month <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF portal_paymentrecord FOR VALUES FROM (%L) TO (%L)',
+            'portal_paymentrecord_p' || to_char(month, 'YYYYMM'),
+            month AT TIME ZONE 'UTC',
+            (month + interval '1 month') AT TIME ZONE 'UTC'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$;
+
+INSERT INTO portal_paymentrecord SELECT * FROM portal_paymentrecord_unpartitioned;
+SELECT setval('portal_paymentrecord_id_seq', coalesce(max(id), 0) + 1, false) FROM portal_paymentrecord;
+INSERT INTO portal_paymentkey (payment_id, reference_number, created_at)
+    SELECT payment_id, reference_number, created_at FROM portal_paymentrecord;
+DROP TABLE portal_paymentrecord_unpartitioned;
+
+-- Per-partition lookups on the two columns; the old names are kept.
+CREATE INDEX portal_paymentrecord_payment_id_376cf7e4_like
+    ON portal_paymentrecord (payment_id varchar_pattern_ops);
+CREATE INDEX portal_paymentrecord_reference_number_302df5ce_like
+    ON portal_paymentrecord (reference_number varchar_pattern_ops);
+
+-- An update of either key (or a move to another month) is mirrored as delete + insert.
+CREATE FUNCTION portal_payment_keys() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM portal_paymentkey WHERE payment_id = OLD.payment_id;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO portal_paymentkey (payment_id, reference_number, created_at)
+        VALUES (NEW.payment_id, NEW.reference_number, NEW.created_at);
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER portal_payment_keys
+    AFTER INSERT OR DELETE OR UPDATE OF payment_id, reference_number, created_at ON portal_paymentrecord
+    FOR EACH ROW EXECUTE FUNCTION portal_payment_keys();
+CREATE TRIGGER portal_payment_not_archived
+    BEFORE INSERT OR UPDATE OF payment_id, reference_number ON portal_paymentrecord
+    FOR EACH ROW EXECUTE FUNCTION portal_payment_not_archived();
+"""
+
+# Back to one plain table. Partitions detached by `manage.py payment_partitions` are not
+# part of the table any more and are left alone.
+UNPARTITION_SQL = """
+DROP TRIGGER portal_payment_keys ON portal_paymentrecord;
+DROP FUNCTION portal_payment_keys();
+ALTER TABLE portal_paymentrecord RENAME TO portal_paymentrecord_partitioned;
+
+CREATE TABLE portal_paymentrecord (
+    LIKE portal_paymentrecord_partitioned INCLUDING CONSTRAINTS
+);
+INSERT INTO portal_paymentrecord SELECT * FROM portal_paymentrecord_partitioned;
+DROP TABLE portal_paymentrecord_partitioned;
+
+ALTER TABLE portal_paymentrecord ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY;
+SELECT setval(pg_get_serial_sequence('portal_paymentrecord', 'id'), coalesce(max(id), 0) + 1, false)
+    FROM portal_paymentrecord;
+ALTER TABLE portal_paymentrecord
+    ADD CONSTRAINT portal_paymentrecord_pkey PRIMARY KEY (id),
+    ADD CONSTRAINT portal_paymentrecord_payment_id_key UNIQUE (payment_id),
+    ADD CONSTRAINT portal_paymentrecord_reference_number_key UNIQUE (reference_number);
+CREATE INDEX portal_paymentrecord_payment_id_376cf7e4_like
+    ON portal_paymentrecord (payment_id varchar_pattern_ops);
+CREATE INDEX portal_paymentrecord_reference_number_302df5ce_like
+    ON portal_paymentrecord (reference_number varchar_pattern_ops);
+CREATE TRIGGER portal_payment_not_archived
+    BEFORE INSERT OR UPDATE OF payment_id, reference_number ON portal_paymentrecord
+    FOR EACH ROW EXECUTE FUNCTION portal_payment_not_archived();
+"""
+
+
+def _add_model_indexes(apps, schema_editor):
+    PaymentRecord = apps.get_model("portal", "PaymentRecord")
+    for index in PaymentRecord._meta.indexes:
+        schema_editor.add_index(PaymentRecord, index)
+
+
+def partition_payments(apps, schema_editor):
+    schema_editor.execute(PARTITION_SQL, params=None)
+    _add_model_indexes(apps, schema_editor)
+
+
+def unpartition_payments(apps, schema_editor):
+    schema_editor.execute(UNPARTITION_SQL, params=None)
+    _add_model_indexes(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0013_payment_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentevent',
+            name='payment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='portal.paymentrecord'),
+        ),
+        migrations.CreateModel(
+            name='PaymentKey',
+            fields=[
+                ('payment_id', models.CharField(max_length=120, primary_key=True, serialize=False)),
+                ('reference_number', models.CharField(max_length=80, unique=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'payment key',
+                'verbose_name_plural': 'payment keys',
+                'indexes': [models.Index(django.db.models.functions.text.Lower('reference_number'), name='portal_paykey_reference_ci')],
+            },
+        ),
+        migrations.RunPython(partition_payments, unpartition_payments),
+    ]
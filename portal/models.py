@@ -1,51 +1,615 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import Lower, Upper
+from django.utils import timezone
+
+
+class CodeChoices(models.IntegerChoices):
+    """
+    Choices stored as small integer codes; the labels are the strings the API reports.
+    Every set has an ``OTHER`` code (0) for text that matches none of its labels. Such text,
+    and text that differs from its label in case only, is kept verbatim in the field's
+    ``<field>_text`` column so it reads back exactly as it was written.
+    """
+
+    @classmethod
+    def from_label(cls, text):
+        """Case-insensitive label lookup; None for anything that is not a known label."""
+        text = (text or "").strip().lower()
+        for member in cls:
+            if member.label.lower() == text:
+                return member
+        return None
+
+    @classmethod
+    def coded(cls, text):
+        """``(code, text to keep)`` for ``text``; the kept text is "" when it is exactly the label."""
+        text = (text or "").strip()
+        member = cls.from_label(text)
+        if member is None:
+            return cls.OTHER, text
+        return member, "" if text == member.label else text
+
+
+def coded_label(choices, code, text):
+    """The text a coded value was written with, or its code's label."""
+    return text or choices(code).label
+
+
+def kept_text(choices, code, text):
+    """``text`` while it still spells ``code`` (or ``code`` is OTHER), else ""; for saves that change codes."""
+    if text and code != choices.OTHER and choices.from_label(text) != code:
+        return ""
+    return text
+
+
+def _insert_parts(instance):
+    """Quoted table, column list, placeholders and params for a raw INSERT of ``instance``."""
+    meta = instance._meta
+    fields = [f for f in meta.concrete_fields if not f.primary_key]
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    params = [f.get_db_prep_save(f.pre_save(instance, True), connection) for f in fields]
+    return connection.ops.quote_name(meta.db_table), columns, placeholders, params
+
+
+def _from_returning(queryset, row):
+    """Build a model instance from a ``RETURNING`` row of every concrete column."""
+    fields = queryset.model._meta.concrete_fields
+    values = []
+    for field, value in zip(fields, row):
+        column = field.get_col(queryset.model._meta.db_table)
+        for converter in connection.ops.get_db_converters(column) + column.get_db_converters(connection):
+            value = converter(value, column, connection)
+        values.append(value)
+    return queryset.model.from_db(queryset.db, [f.attname for f in fields], values)
+
+
+class CustomerSubscriptionQuerySet(models.QuerySet):
+    def for_product_email(self, product, email):
+        """Case-insensitive (product, email) match served by the functional index."""
+        return self.alias(product_ci=Lower("product"), email_ci=Lower("email")).filter(
+            product_ci=(product or "").strip().lower(),
+            email_ci=(email or "").strip().lower(),
+        )
+
+    def create_if_absent(self, **values):
+        """
+        Insert a subscription with a single INSERT ... ON CONFLICT DO NOTHING keyed on the
+        normalized (product, email) constraint. Returns the new instance, or None when a
+        row for that pair already exists (e.g. a concurrent request won the race).
+        """
+        instance = self.model(**values)
+        instance.normalize()
+        table, columns, placeholders, params = _insert_parts(instance)
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) "
+            'ON CONFLICT ((LOWER("product")), (LOWER("email"))) DO NOTHING '
+            'RETURNING "id"'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        instance.pk = row[0]
+        instance._state.adding = False
+        instance._state.db = self.db
+        return instance
+
+    def statuses_for(self, pairs):
+        """
+        Resolve many normalized ``(product, email)`` pairs with one query joined against a
+        VALUES list over the (lower(product), lower(email)) index. Returns
+        ``{(product, email): status}`` for the pairs that exist, with statuses as labels.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        values = ", ".join(["(%s, %s)"] * len(pairs))
+        sql = (
+            f'SELECT LOWER("product"), LOWER("email"), "status", "status_text" FROM {table} '
+            f'WHERE (LOWER("product"), LOWER("email")) IN (VALUES {values})'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [value for pair in pairs for value in pair])
+            rows = cursor.fetchall()
+        return {
+            (product, email): coded_label(self.model.Status, status, text) for product, email, status, text in rows
+        }
+
+    def bulk_upsert(self, instances, update_fields=None):
+        """
+        Insert many subscriptions in one INSERT ... ON CONFLICT keyed on the normalized
+        (product, email) constraint. Rows that already exist get ``update_fields`` (plus
+        ``updated_at``) overwritten, or are left alone when ``update_fields`` is None.
+        Returns ``(product, email, status label)`` for every row inserted or updated.
+        """
+        if not instances:
+            return []
+        params = []
+        rows = []
+        for instance in instances:
+            instance.normalize()
+            table, columns, placeholders, instance_params = _insert_parts(instance)
+            rows.append(f"({placeholders})")
+            params.extend(instance_params)
+        if update_fields:
+            assignments = ", ".join(
+                f"{connection.ops.quote_name(name)} = EXCLUDED.{connection.ops.quote_name(name)}"
+                for name in [*update_fields, "updated_at"]
+            )
+            on_conflict = f"DO UPDATE SET {assignments}"
+        else:
+            on_conflict = "DO NOTHING"
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES {', '.join(rows)} "
+            f'ON CONFLICT ((LOWER("product")), (LOWER("email"))) {on_conflict} '
+            'RETURNING LOWER("product"), LOWER("email"), "status", "status_text"'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [
+            (product, email, coded_label(self.model.Status, status, text)) for product, email, status, text in rows
+        ]
+
+
+class SubscriptionStatus(CodeChoices):
+    """``CustomerSubscription.Status``; module level so the model's Meta can refer to it."""
+
+    OTHER = 0, "Other"
+    PAID = 1, "Paid"
+    FREE = 2, "Free"
+    IN_ARREARS = 3, "In Arrears"
 
 
 class CustomerSubscription(models.Model):
-    class Status(models.TextChoices):
-        PAID = "Paid", "Paid"
-        FREE = "Free", "Free"
-        IN_ARREARS = "In Arrears", "In arrears"
+    Status = SubscriptionStatus
+
+    class SubscriptionType(CodeChoices):
+        OTHER = 0, "Other"
+        ONE_TIME = 1, "One-time"
+        MONTHLY = 2, "Monthly"
+        YEARLY = 3, "Yearly"
+        PILOT = 4, "Pilot"
 
     external_id = models.CharField(max_length=50, unique=True)
     product = models.CharField(max_length=120)
     email = models.EmailField()
     username = models.CharField(max_length=120)
     last_login = models.DateTimeField(blank=True, null=True)
-    subscription_type = models.CharField(max_length=60)
-    status = models.CharField(
-        max_length=20,
+    subscription_type = models.PositiveSmallIntegerField(choices=SubscriptionType.choices)
+    # The text a coded value was entered as when it is not exactly its label (see CodeChoices).
+    subscription_type_text = models.CharField(max_length=40, blank=True, default="")
+    status = models.PositiveSmallIntegerField(
         choices=Status.choices,
         default=Status.PAID,
     )
+    status_text = models.CharField(max_length=40, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CustomerSubscriptionQuerySet.as_manager()
+
     class Meta:
         ordering = ["external_id"]
         verbose_name = "customer subscription"
         verbose_name_plural = "customer subscriptions"
+        constraints = [
+            models.UniqueConstraint(
+                Lower("product"),
+                Lower("email"),
+                name="portal_sub_product_email_uniq",
+            ),
+        ]
+        indexes = [
+            # Dashboard search (portal/search.py): exact email lookups, and one trigram index
+            # serving UPPER(col) LIKE UPPER('%term%') on every searched text column.
+            models.Index(Lower("email"), name="portal_sub_email_ci"),
+            GinIndex(
+                *(OpClass(Upper(field), name="gin_trgm_ops")
+                  for field in ("external_id", "product", "email", "username",
+                                "subscription_type_text", "status_text")),
+                name="portal_sub_search_trgm",
+            ),
+            # Accounts in arrears are a small slice that the admin filters on, in list order.
+            models.Index(
+                fields=["external_id"],
+                condition=models.Q(status=SubscriptionStatus.IN_ARREARS),
+                name="portal_sub_in_arrears",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.external_id} ({self.product})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "product" in field_names and "email" in field_names:
+            # Remember the loaded key so a save that changes product/email invalidates both.
+            instance._loaded_status_key = (instance.product, instance.email)
+        return instance
+
+    def get_subscription_type_display(self):
+        return coded_label(self.SubscriptionType, self.subscription_type, self.subscription_type_text)
+
+    def get_status_display(self):
+        return coded_label(self.Status, self.status, self.status_text)
+
+    def normalize(self):
+        # Keep stored values normalized so lookups never depend on caller casing/whitespace.
+        self.product = (self.product or "").strip()
+        self.email = (self.email or "").strip().lower()
+        self.subscription_type_text = kept_text(
+            self.SubscriptionType, self.subscription_type, self.subscription_type_text
+        )
+        self.status_text = kept_text(self.Status, self.status, self.status_text)
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+
+def _status_progress(column):
+    """SQL for how far along the payment status in ``column`` is (see ``PaymentRecord.STATUS_PROGRESS``)."""
+    whens = " ".join(f"WHEN {int(code)} THEN {rank}" for code, rank in PaymentRecord.STATUS_PROGRESS.items())
+    return f"(CASE {column} {whens} ELSE 0 END)"
+
+
+def _guarded_status_update(table, values):
+    """
+    ``UPDATE {table} AS p ... FROM {values} AS v`` applying each delivery's status only if
+    it does not move the payment backwards. ``values`` provides ``payment_id``, ``status``
+    and ``status_text``; ``updated_at`` is the first parameter. A regressive delivery leaves
+    the row as it is but still matches, so callers get it back from ``RETURNING`` instead of
+    inserting the payment again. The caller appends the WHERE clause.
+    """
+    incoming, current = _status_progress('v."status"'), _status_progress('p."status"')
+    assignments = ", ".join(
+        f'"{column}" = CASE WHEN {incoming} >= {current} THEN {value} ELSE p."{column}" END'
+        for column, value in (("status", 'v."status"'), ("status_text", 'v."status_text"'), ("updated_at", "%s"))
+    )
+    return f'UPDATE {table} AS p SET {assignments} FROM {values} AS v ("payment_id", "status", "status_text") '
+
+
+class PaymentRecordQuerySet(models.QuerySet):
+    def upsert_by_payment_id(self, **values):
+        """
+        Insert a payment, or update the status of the row with the same ``payment_id``.
+        Returns ``(record, created)``. Webhook retries therefore land on the existing row
+        instead of raising IntegrityError, and status transitions (e.g. pending -> paid) are
+        applied in place. A delivery that would move the payment backwards (a late or
+        replayed "pending" after "paid") leaves it unchanged, so out-of-order deliveries
+        are harmless. ``PaymentRecord`` is partitioned, so there is no unique index to
+        run ``ON CONFLICT`` against: the existing row is located through ``PaymentKey``
+        (which also prunes the UPDATE to its partition) and otherwise inserted. A reference
+        number taken by another payment still raises IntegrityError.
+        """
+        instance = self.model(**values)
+        table, columns, placeholders, params = _insert_parts(instance)
+        keys = connection.ops.quote_name(PaymentKey._meta.db_table)
+        columns_returned = [connection.ops.quote_name(f.column) for f in self.model._meta.concrete_fields]
+        update_sql = (
+            _guarded_status_update(table, "(VALUES (%s, %s, %s))")
+            + 'WHERE p."payment_id" = v."payment_id" '
+            f'AND p."created_at" = (SELECT "created_at" FROM {keys} WHERE "payment_id" = v."payment_id") '
+            f"RETURNING {', '.join(f'p.{column}' for column in columns_returned)}"
+        )
+        update_params = [instance.updated_at, instance.payment_id, instance.status, instance.status_text]
+        returning = ", ".join(columns_returned)
+        insert_sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders}) RETURNING {returning}"
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(update_sql, update_params)
+            row = cursor.fetchone()
+            if row is not None:
+                return _from_returning(self, row), False
+            try:
+                with transaction.atomic(using=self.db):
+                    cursor.execute(insert_sql, params)
+                    return _from_returning(self, cursor.fetchone()), True
+            except IntegrityError:
+                # Either the reference belongs to another payment, or a concurrent delivery
+                # of this payment inserted it first; in the latter case ours is an update.
+                cursor.execute(update_sql, update_params)
+                row = cursor.fetchone()
+                if row is None:
+                    raise
+                return _from_returning(self, row), False
+
+    def bulk_upsert_by_payment_id(self, values_list):
+        """
+        Set-based ``upsert_by_payment_id`` for payments with distinct payment IDs: one
+        UPDATE ... FROM (VALUES ...) joined through ``PaymentKey`` for the ones already
+        recorded (with the same guard against moving a payment backwards), then one
+        multi-row INSERT for the rest. Returns the records; raises
+        IntegrityError if any insert collides, leaving the caller to retry row by row.
+        """
+        instances = [self.model(**values) for values in values_list]
+        if not instances:
+            return []
+        now = timezone.now()
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        keys = quote(PaymentKey._meta.db_table)
+        returning = ", ".join(f"p.{quote(f.column)}" for f in self.model._meta.concrete_fields)
+        sql = (
+            _guarded_status_update(table, f'(VALUES {", ".join(["(%s, %s, %s)"] * len(instances))})')
+            + f'JOIN {keys} AS k ON k."payment_id" = v."payment_id" '
+            'WHERE p."payment_id" = k."payment_id" AND p."created_at" = k."created_at" '
+            f"RETURNING {returning}"
+        )
+        params = [now]
+        for instance in instances:
+            params.extend([instance.payment_id, instance.status, instance.status_text])
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                updated = [_from_returning(self, row) for row in cursor.fetchall()]
+            seen = {record.payment_id for record in updated}
+            inserted = self.bulk_create([instance for instance in instances if instance.payment_id not in seen])
+        return updated + inserted
+
+    def for_reference(self, reference):
+        """Case-insensitive reference match served by the lower(reference_number) index."""
+        return self.alias(reference_ci=Lower("reference_number")).filter(
+            reference_ci=(reference or "").strip().lower()
+        )
+
+    def unused(self):
+        """Payments not consumed yet; with ``for_reference`` this is served by the partial index."""
+        return self.filter(used=False)
+
+    def known_references(self, references):
+        """
+        The lowered ``references`` that belong to any payment, consumed or not, including
+        payments moved to ``ArchivedPayment`` or detached with their partition. Tells
+        "already used" apart from "unknown" after a consume finds nothing.
+        """
+        lowered = {(reference or "").strip().lower() for reference in references} - {""}
+        if not lowered:
+            return set()
+        # PaymentKey also covers payments in detached partitions (see portal.partitions).
+        known = set(
+            PaymentKey.objects.annotate(reference_ci=Lower("reference_number"))
+            .filter(reference_ci__in=lowered)
+            .values_list("reference_ci", flat=True)
+        )
+        if lowered - known:
+            known.update(
+                ArchivedPayment.objects.annotate(reference_ci=Lower("reference_number"))
+                .filter(reference_ci__in=lowered - known)
+                .values_list("reference_ci", flat=True)
+            )
+        return known
+
+    def consume(self, reference):
+        """
+        Mark one unused payment matching ``reference`` (case-insensitively) as used with one
+        UPDATE ... RETURNING. The row is picked and locked by a subquery over the partial
+        index on unused references; references are unique only case-sensitively, so "ABC"
+        and "abc" may both exist and each consume uses up only one of them, oldest first.
+        A row another call has locked is skipped, so concurrent calls for the same reference
+        never consume it twice: one gets the record back, the others get None.
+        """
+        consumed = self._consume_one_per_reference([(reference or "").strip().lower()])
+        return consumed[0] if consumed else None
+
+    def consume_many(self, references):
+        """
+        Set-based ``consume``: one UPDATE ... RETURNING consuming at most one unused payment
+        per distinct reference in ``references``. Returns the consumed records.
+        """
+        lowered = sorted({(reference or "").strip().lower() for reference in references} - {""})
+        return self._consume_one_per_reference(lowered) if lowered else []
+
+    def _consume_one_per_reference(self, lowered):
+        now = timezone.now()
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        returning = ", ".join(f"p.{connection.ops.quote_name(f.column)}" for f in self.model._meta.concrete_fields)
+        sql = (
+            f'UPDATE {table} AS p SET "used" = true, "date_consumed" = %s, "updated_at" = %s '
+            f'FROM (VALUES {", ".join(["(%s)"] * len(lowered))}) AS r ("reference") '
+            "CROSS JOIN LATERAL ("
+            f'SELECT "id", "created_at" FROM {table} WHERE LOWER("reference_number") = r."reference" '
+            'AND "used" = false ORDER BY "created_at", "id" LIMIT 1 FOR UPDATE SKIP LOCKED'
+            ") AS due "
+            'WHERE p."id" = due."id" AND p."created_at" = due."created_at" '
+            f"RETURNING {returning}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [now, now, *lowered])
+            rows = cursor.fetchall()
+        return [_from_returning(self, row) for row in rows]
+
 
 class PaymentRecord(models.Model):
+    """
+    A logged payment. In PostgreSQL the table is range-partitioned by month of
+    ``created_at`` (see portal.partitions); its primary key there is ``(id, created_at)``,
+    and ``id`` stays unique because every partition draws from one sequence.
+    """
+
+    class Status(CodeChoices):
+        # PayMongo payment statuses, as reported in its payloads.
+        OTHER = 0, "other"
+        PENDING = 1, "pending"
+        PAID = 2, "paid"
+        FAILED = 3, "failed"
+        REFUNDED = 4, "refunded"
+
+    # How far along a payment is; anything not listed is 0. Deliveries never move a payment
+    # to a lower rank (see PaymentRecordQuerySet.upsert_by_payment_id).
+    STATUS_PROGRESS = {Status.FAILED: 1, Status.PAID: 2, Status.REFUNDED: 3}
+
     name = models.CharField(max_length=180)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # Unique across all partitions through PaymentKey rather than an index on this table;
+    # see migration 0014 before altering either field.
     reference_number = models.CharField(max_length=80, unique=True)
     payment_id = models.CharField(max_length=120, unique=True)
-    status = models.CharField(max_length=40)
+    status = models.PositiveSmallIntegerField(choices=Status.choices)
+    # The status as the caller sent it when that is not exactly its label (see CodeChoices).
+    status_text = models.CharField(max_length=40, blank=True, default="")
     used = models.BooleanField(default=False)
     email = models.EmailField()
     date_consumed = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PaymentRecordQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "payment record"
         verbose_name_plural = "payment records"
+        indexes = [
+            models.Index(Lower("reference_number"), name="portal_pay_reference_ci"),
+            # Keyset pagination on the dashboard seeks on (created_at, id).
+            models.Index(fields=["-created_at", "-id"], name="portal_pay_created_id"),
+            models.Index(Lower("email"), name="portal_pay_email_ci"),
+            GinIndex(
+                *(OpClass(Upper(field), name="gin_trgm_ops")
+                  for field in ("name", "email", "reference_number", "payment_id", "status_text")),
+                name="portal_pay_search_trgm",
+            ),
+            # Unconsumed payments, newest first: the admin's "used: No" filter.
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(used=False),
+                name="portal_pay_unused_created",
+            ),
+            # Unconsumed payments by normalized reference: license_consume and the admin's
+            # reference search within "used: No". Stays small as payments get consumed.
+            models.Index(
+                Lower("reference_number"),
+                condition=models.Q(used=False),
+                name="portal_pay_unused_reference",
+            ),
+            # Consumed payments by age, for archive_payments.
+            models.Index(
+                fields=["date_consumed"],
+                condition=models.Q(used=True),
+                name="portal_pay_consumed_at",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reference_number} ({self.get_status_display()})"
+
+    def get_status_display(self):
+        return coded_label(self.Status, self.status, self.status_text)
+
+    def save(self, *args, **kwargs):
+        self.status_text = kept_text(self.Status, self.status, self.status_text)
+        super().save(*args, **kwargs)
+
+
+class ArchivedPayment(models.Model):
+    """
+    Consumed ``PaymentRecord`` moved out of the hot table by ``manage.py archive_payments``
+    (see portal.archive). Rows keep their original primary key. A database trigger stops
+    the hot table from taking a payment ID or reference number that is archived here, so an
+    archived license cannot be recorded and consumed again.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=180)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    reference_number = models.CharField(max_length=80, unique=True)
+    payment_id = models.CharField(max_length=120, unique=True)
+    status = models.PositiveSmallIntegerField(choices=PaymentRecord.Status.choices)
+    status_text = models.CharField(max_length=40, blank=True, default="")
+    email = models.EmailField()
+    date_consumed = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-date_consumed"]
+        verbose_name = "archived payment"
+        verbose_name_plural = "archived payments"
+        indexes = [
+            models.Index(Lower("reference_number"), name="portal_archpay_reference_ci"),
+        ]
+
+    def __str__(self):
+        return f"{self.reference_number} (archived)"
+
+    def get_status_display(self):
+        return coded_label(PaymentRecord.Status, self.status, self.status_text)
+
+
+class PaymentKey(models.Model):
+    """
+    Payment ID and reference number of every payment in ``PaymentRecord``, including
+    detached partitions. A partitioned table can only enforce uniqueness per partition, so
+    database triggers on ``PaymentRecord`` mirror each insert, update and delete here and
+    these two unique columns keep both values unique across all months. ``created_at``
+    is the payment's partition key, which lets updates by ``payment_id`` skip the other
+    partitions.
+    """
+
+    payment_id = models.CharField(max_length=120, primary_key=True)
+    reference_number = models.CharField(max_length=80, unique=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "payment key"
+        verbose_name_plural = "payment keys"
+        indexes = [
+            models.Index(Lower("reference_number"), name="portal_paykey_reference_ci"),
+        ]
+
+    def __str__(self):
+        return self.payment_id
+
+
+class PaymentEvent(models.Model):
+    """Verified raw log_payments delivery waiting to be ingested (see portal.ingest)."""
+
+    payload = models.BinaryField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # No database constraint: a foreign key cannot reference the partitioned PaymentRecord
+    # by id alone. Django still applies on_delete when payments are deleted through the ORM.
+    payment = models.ForeignKey(
+        PaymentRecord, null=True, blank=True, on_delete=models.SET_NULL, db_constraint=False
+    )
+
+    class Meta:
+        ordering = ["id"]
+        verbose_name = "payment event"
+        verbose_name_plural = "payment events"
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="portal_event_pending",
+            ),
+        ]
+
+    def __str__(self):
+        state = "processed" if self.processed_at else "pending"
+        return f"Event {self.pk} ({state})"
+
+
+class ExternalIdCounter(models.Model):
+    """High-water mark of allocated external ID numbers per prefix (see portal.external_ids)."""
+
+    prefix = models.CharField(max_length=10, unique=True)
+    last_value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "external ID counter"
+        verbose_name_plural = "external ID counters"
 
     def __str__(self):
-        return f"{self.reference_number} ({self.status})"
+        return f"{self.prefix} ({self.last_value})"
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination for the dashboard tables.
+
+Instead of ``OFFSET n`` each page seeks past the ordering key of the last row shown,
+e.g. ``WHERE created_at <= %s AND (created_at < %s OR (created_at = %s AND id < %s))
+ORDER BY created_at DESC, id DESC LIMIT 6``, so a deep page costs the same index range
+scan as the first one and nothing runs ``COUNT(*)``. Cursors are opaque URL-safe tokens carrying the direction and the key of
+the boundary row. The ordering must end in a unique column so keys never tie.
+
+Totals come from ``table_count``, which reads the planner's row estimate from
+``pg_class.reltuples`` on PostgreSQL (summed over the partitions of a partitioned
+table) and only falls back to an exact ``COUNT(*)`` for small tables, where it is cheap.
+"""
+
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, router
+from django.db.models import Q
+
+DEFAULT_EXACT_COUNT_THRESHOLD = 10000
+
+
+def encode_cursor(direction, key):
+    raw = json.dumps([direction, list(key)], default=lambda value: value.isoformat(), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Return ``(direction, key)`` for a cursor token, or ``(None, None)`` if it is not one."""
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, key = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None, None
+    if direction not in ("n", "p") or not isinstance(key, list):
+        return None, None
+    return direction, key
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [(name.lstrip("-"), name.startswith("-")) for name in self.ordering]
+
+    def page(self, cursor=None):
+        direction, raw_key = decode_cursor(cursor)
+        key = self._parse_key(raw_key)
+        backwards = direction == "p" and key is not None
+
+        queryset = self.queryset.order_by(*(self._reversed_ordering() if backwards else self.ordering))
+        if key is not None:
+            queryset = queryset.filter(self._seek(key, backwards))
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+
+        if key is not None and not rows:
+            # The rows around a stale cursor are gone; start over.
+            return self.page(None)
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, key is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor("n", self._key_of(rows[-1])) if has_next else None,
+            previous_cursor=encode_cursor("p", self._key_of(rows[0])) if has_previous else None,
+        )
+
+    def _parse_key(self, raw_key):
+        if raw_key is None or len(raw_key) != len(self.fields):
+            return None
+        opts = self.queryset.model._meta
+        try:
+            return [opts.get_field(name).to_python(value) for (name, _), value in zip(self.fields, raw_key)]
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def _key_of(self, row):
+        return [getattr(row, name) for name, _ in self.fields]
+
+    def _reversed_ordering(self):
+        return [name if descending else f"-{name}" for name, descending in self.fields]
+
+    def _seek(self, key, backwards):
+        """Rows strictly after ``key`` in the ordering (before it when ``backwards``)."""
+        condition = Q()
+        first, descending = self.fields[0]
+        # Redundant inclusive bound on the leading column so the planner gets an index range.
+        bound = Q(**{f"{first}__{'lte' if descending != backwards else 'gte'}": key[0]})
+        for position, (name, descending) in enumerate(self.fields):
+            lookup = "lt" if descending != backwards else "gt"
+            term = Q(**{f"{name}__{lookup}": key[position]})
+            for earlier in range(position):
+                term &= Q(**{self.fields[earlier][0]: key[earlier]})
+            condition |= term
+        return bound & condition
+
+
+def table_count(model):
+    """Return ``(count, approximate)`` for a whole table, estimating large PostgreSQL tables."""
+    manager = model._default_manager
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            # A partitioned table has no rows of its own; sum its partitions' estimates.
+            cursor.execute(
+                "SELECT CASE WHEN c.relkind = 'p' THEN ("
+                "SELECT coalesce(sum(greatest(p.reltuples, 0)), 0) FROM pg_inherits i "
+                "JOIN pg_class p ON p.oid = i.inhrelid WHERE i.inhparent = c.oid"
+                ") ELSE c.reltuples END::bigint FROM pg_class c WHERE c.oid = %s::regclass",
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        estimate = row[0] if row else -1
+        # -1 means the table has never been analyzed.
+        if estimate >= getattr(settings, "PLUGHUB_DASHBOARD_EXACT_COUNT_THRESHOLD", DEFAULT_EXACT_COUNT_THRESHOLD):
+            return estimate, True
+    return manager.count(), False
@@ -0,0 +1,166 @@
+"""
+Monthly partitions of ``PaymentRecord``.
+
+Migration 0014 range-partitions the table by ``created_at``, one partition per calendar
+month (UTC) named ``portal_paymentrecord_pYYYYMM``, plus a default partition that catches
+rows for months that have no partition yet. ``manage.py payment_partitions`` keeps it
+that way:
+
+* it creates the current month and ``PLUGHUB_PAYMENT_PARTITION_MONTHS_AHEAD`` months after
+  it. Rows the default partition caught for one of those months are moved into it;
+* with ``PLUGHUB_PAYMENT_PARTITION_RETAIN_MONTHS`` set, months older than that are taken
+  out of the table. A month is dropped when it is empty (e.g. once ``archive_payments``
+  has moved everything out). It is detached as a standalone table when every payment in
+  it has been consumed. It is kept while any payment in it is still unused, so no license
+  becomes unconsumable.
+
+Global uniqueness of payment IDs and references lives in ``PaymentKey``. A detached
+month's rows keep their keys, so its payment IDs and references stay taken and still
+read as "already used". The detached table can be dumped and dropped at leisure.
+"""
+
+import re
+from datetime import date, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PaymentKey, PaymentRecord
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_RETAIN_MONTHS = 0
+
+DEFAULT_PARTITION = f"{PaymentRecord._meta.db_table}_default"
+PARTITION_NAME_RE = re.compile(rf"^{PaymentRecord._meta.db_table}_p(\d{{4}})(\d{{2}})$")
+
+
+def month_start(moment=None):
+    """First day of the UTC month containing ``moment`` (default: now)."""
+    moment = (moment or timezone.now()).astimezone(dt_timezone.utc)
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PaymentRecord._meta.db_table}_p{month:%Y%m}"
+
+
+def _bounds(month):
+    """SQL literals for the ``FROM``/``TO`` bounds of ``month``'s partition."""
+    return tuple(f"'{bound:%Y-%m-%d} 00:00:00+00'" for bound in (month, add_months(month, 1)))
+
+
+def attached_partitions():
+    """``{month: name}`` for the monthly partitions currently attached."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [PaymentRecord._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def default_partition_rows():
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {quote(DEFAULT_PARTITION)}")
+        return cursor.fetchone()[0]
+
+
+def create_partition(month):
+    """Create ``month``'s partition, moving in any rows the default partition holds for it."""
+    quote = connection.ops.quote_name
+    parent = quote(PaymentRecord._meta.db_table)
+    default = quote(DEFAULT_PARTITION)
+    keys = quote(PaymentKey._meta.db_table)
+    name = quote(partition_name(month))
+    lower, upper = _bounds(month)
+    in_month = f'"created_at" >= {lower} AND "created_at" < {upper}'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {default} WHERE {in_month} LIMIT 1")
+        if cursor.fetchone() is None:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {parent} FOR VALUES FROM ({lower}) TO ({upper})")
+            return 0
+        # A partition cannot be created over rows the default partition holds. Move them
+        # into a standalone table and attach that instead; deleting them drops their
+        # PaymentKey rows, which are put back in the same transaction.
+        cursor.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE {in_month} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        )
+        moved = cursor.rowcount
+        cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})")
+        cursor.execute(
+            f'INSERT INTO {keys} ("payment_id", "reference_number", "created_at") '
+            f'SELECT "payment_id", "reference_number", "created_at" FROM {name}'
+        )
+        return moved
+
+
+def ensure_partitions(months_ahead=None, now=None, dry_run=False):
+    """
+    Create the missing partitions from the current month through ``months_ahead`` months
+    after it. Returns ``[(name, rows moved from the default partition)]``; with
+    ``dry_run`` nothing is created and the row counts are None.
+    """
+    if months_ahead is None:
+        months_ahead = getattr(settings, "PLUGHUB_PAYMENT_PARTITION_MONTHS_AHEAD", DEFAULT_MONTHS_AHEAD)
+    current = month_start(now)
+    existing = attached_partitions()
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        created.append((partition_name(month), None if dry_run else create_partition(month)))
+    return created
+
+
+def retire_partitions(retain_months=None, now=None, dry_run=False):
+    """
+    Take months older than ``retain_months`` out of the table. Returns
+    ``[(name, action)]`` with action ``"dropped"``, ``"detached"`` or ``"kept"`` (it still
+    holds unused payments). ``retain_months`` of 0 keeps every month.
+    """
+    if retain_months is None:
+        retain_months = getattr(settings, "PLUGHUB_PAYMENT_PARTITION_RETAIN_MONTHS", DEFAULT_RETAIN_MONTHS)
+    if retain_months <= 0:
+        return []
+    quote = connection.ops.quote_name
+    parent = quote(PaymentRecord._meta.db_table)
+    oldest_kept = add_months(month_start(now), -retain_months)
+    results = []
+    for month, name in sorted(attached_partitions().items()):
+        if month >= oldest_kept:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            if not dry_run:
+                cursor.execute(f"LOCK TABLE {quote(name)} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f'SELECT count(*), count(*) FILTER (WHERE NOT "used") FROM {quote(name)}')
+            total, unused = cursor.fetchone()
+            if unused:
+                action = "kept"
+            elif total == 0:
+                action = "dropped"
+                if not dry_run:
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+            else:
+                action = "detached"
+                if not dry_run:
+                    cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {quote(name)}")
+        results.append((name, action))
+    return results
@@ -0,0 +1,170 @@
+"""
+Request payload handling shared by the API views.
+
+The body is parsed at most once per request and the result is cached on the request.
+``orjson`` is used when installed, otherwise the stdlib ``json`` module. Views only read
+the top-level ``data`` object (or the top level itself), so keys are lowercased along
+that path alone, and only when a key is not already lowercase.
+"""
+
+import json
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+
+_UNSET = object()
+
+
+def loads(raw):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _lowercase_keys(data):
+    for key in data:
+        if not isinstance(key, str) or not key.islower():
+            return {str(k).lower(): v for k, v in data.items()}
+    return data
+
+
+def _find_key(data, name):
+    if name in data:
+        return data[name]
+    for key, value in data.items():
+        if str(key).lower() == name:
+            return value
+    return None
+
+
+def max_body_bytes(setting="PLUGHUB_API_MAX_BODY_BYTES"):
+    return getattr(settings, setting, DEFAULT_MAX_BODY_BYTES)
+
+
+def body_size_limit(setting="PLUGHUB_API_MAX_BODY_BYTES"):
+    """Decorator rejecting bodies over the given size setting with 413 before anything reads them."""
+
+    def too_large(request):
+        limit = max_body_bytes(setting)
+        try:
+            declared = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            declared = 0
+        return bool(limit and declared > limit)
+
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+
+            async def async_wrapper(request, *args, **kwargs):
+                if too_large(request):
+                    return JsonResponse({"error": "Request body too large"}, status=413)
+                return await view_func(request, *args, **kwargs)
+
+            return wraps(view_func)(async_wrapper)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if too_large(request):
+                return JsonResponse({"error": "Request body too large"}, status=413)
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+limit_body_size = body_size_limit()
+
+
+def extract_payload(request):
+    """
+    Return ``(data, error_response)`` for a JSON request: the lowercased ``data`` object
+    when present, otherwise the lowercased top-level object.
+    """
+    cached = getattr(request, "_plughub_payload", _UNSET)
+    if cached is not _UNSET:
+        return cached
+
+    result = _parse(request)
+    request._plughub_payload = result
+    return result
+
+
+class PayloadError(ValueError):
+    pass
+
+
+def select_data(payload):
+    """The lowercased ``data`` object of a parsed payload, or its lowercased top level."""
+    data_obj = _find_key(payload, "data")
+    if isinstance(data_obj, dict):
+        return _lowercase_keys(data_obj)
+    return _lowercase_keys(payload)
+
+
+def decode(raw):
+    """Parse raw JSON bytes into the lowercased object the views read; raises PayloadError."""
+    try:
+        payload = loads(raw or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        raise PayloadError("Invalid JSON body")
+
+    if not isinstance(payload, dict):
+        raise PayloadError("Invalid JSON body")
+
+    return select_data(payload)
+
+
+def decode_items(raw, content_type=""):
+    """
+    Parse a batch body into a list of items: a JSON array, ``{"data": [...]}``, or NDJSON
+    (one object per line, for ``application/x-ndjson`` / ``application/jsonl``). Each item
+    is the lowercased object from ``select_data``, or a PayloadError for that item alone.
+    """
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+        objects = []
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                objects.append(loads(line))
+            except (ValueError, UnicodeDecodeError):
+                objects.append(PayloadError("Invalid JSON line"))
+    else:
+        try:
+            payload = loads(raw or b"[]")
+        except (ValueError, UnicodeDecodeError):
+            raise PayloadError("Invalid JSON body")
+        if isinstance(payload, dict):
+            payload = _find_key(payload, "data")
+        if not isinstance(payload, list):
+            raise PayloadError("Expected a JSON array of items")
+        objects = payload
+
+    return [
+        obj if isinstance(obj, PayloadError)
+        else select_data(obj) if isinstance(obj, dict)
+        else PayloadError("Item must be a JSON object")
+        for obj in objects
+    ]
+
+
+def _parse(request):
+    raw = request.body
+    limit = max_body_bytes()
+    if limit and len(raw) > limit:
+        return None, JsonResponse({"error": "Request body too large"}, status=413)
+
+    try:
+        return decode(raw), None
+    except PayloadError as exc:
+        return None, JsonResponse({"error": str(exc)}, status=400)
@@ -0,0 +1,83 @@
+"""
+PayMongo webhook signature verification.
+
+The ``Paymongo-Signature`` header carries ``t=<timestamp>,v1=<hex digest>`` where the
+digest is ``HMAC-SHA256(secret, timestamp + "." + raw_body)``. The raw body bytes are
+fed straight into the MAC, so nothing is decoded or re-encoded and non-UTF-8 bodies are
+verified exactly as signed. Several secrets may be active at once to allow rotation, and
+deliveries whose timestamp falls outside the tolerance window are rejected as replays.
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_TOLERANCE_SECONDS = 300
+
+_keyed_macs = None
+_keyed_macs_lock = threading.Lock()
+
+
+def _get_keyed_macs():
+    """HMAC objects already keyed with each active secret; copying one skips key setup."""
+    global _keyed_macs
+    if _keyed_macs is None:
+        with _keyed_macs_lock:
+            if _keyed_macs is None:
+                secrets = list(getattr(settings, "PAYMONGO_WEBHOOK_SECRETS", []))
+                legacy = getattr(settings, "PAYMONGO_WEBHOOK_SECRET", "")
+                if legacy and legacy not in secrets:
+                    secrets.insert(0, legacy)
+                _keyed_macs = [hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256) for secret in secrets if secret]
+    return _keyed_macs
+
+
+@receiver(setting_changed)
+def _reset_secrets(setting, **kwargs):
+    global _keyed_macs
+    if setting in ("PAYMONGO_WEBHOOK_SECRET", "PAYMONGO_WEBHOOK_SECRETS"):
+        with _keyed_macs_lock:
+            _keyed_macs = None
+
+
+def parse_signature_header(header):
+    try:
+        parts = dict(item.strip().split("=", 1) for item in header.split(","))
+    except ValueError:
+        return None, None
+    return parts.get("t"), parts.get("v1")
+
+
+def verify_signature(header, raw_body, now=None):
+    keyed_macs = _get_keyed_macs()
+    if not keyed_macs or not header:
+        return False
+
+    timestamp, provided_sig = parse_signature_header(header)
+    if not timestamp or not provided_sig:
+        return False
+
+    tolerance = getattr(settings, "PAYMONGO_WEBHOOK_TOLERANCE_SECONDS", DEFAULT_TOLERANCE_SECONDS)
+    if tolerance:
+        try:
+            signed_at = int(timestamp)
+        except ValueError:
+            return False
+        now = time.time() if now is None else now
+        if abs(now - signed_at) > tolerance:
+            return False
+
+    prefix = timestamp.encode("ascii", errors="replace") + b"."
+    body = raw_body or b""
+    for keyed in keyed_macs:
+        mac = keyed.copy()
+        mac.update(prefix)
+        mac.update(body)
+        if hmac.compare_digest(mac.hexdigest(), provided_sig):
+            return True
+    return False
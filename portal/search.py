@@ -0,0 +1,149 @@
+"""
+Dashboard search routing.
+
+Each term is classified by shape. A classified term is answered by the indexed lookup for
+its shape alone; only unclassified terms fall back to the substring search:
+
+* ``external_id`` - a whole customer ID (``INV-2045``; IDs are zero-padded to at least
+  four digits): equality on the unique ``external_id`` index.
+* ``external_id_prefix`` - a partial ID (``INV-``, ``INV-20``): ``LIKE 'INV-20%'`` on the
+  same column, served by its ``varchar_pattern_ops`` index.
+* ``email`` - a full email address: equality on the ``lower(email)`` index.
+* ``payment_id`` - a PayMongo ID or the start of one (``pay_...``): prefix match on the
+  unique ``payment_id`` index.
+* ``identifier`` - any other single token containing a digit (bank or GCash reference,
+  hand-entered payment ID): equality on ``lower(reference_number)`` or ``payment_id``.
+* ``free_text`` - everything else: ``icontains`` ORed across the searchable columns,
+  which PostgreSQL serves from one multi-column ``pg_trgm`` GIN index per table (see the
+  models), plus ``IN`` on the coded status/type columns whose labels contain the term.
+  Values stored under the ``OTHER`` code are matched through their ``*_text`` column.
+  Trigram indexes need at least three characters to narrow anything down; shorter terms
+  still work, they just cannot use the index.
+
+Routed terms skip the substring fallback, so they cost one B-tree probe instead of a
+trigram scan. They only look at the column their shape belongs to: the same text inside
+other rows or columns (``a@x.com`` inside ``ba@x.com``, a reference quoted in a payer's
+name) is not found. Every routed row also matches the substring search. To find those
+other rows, search a fragment that no longer has the shape (``@x.com``, ``REF123``).
+
+Per-route counts and timings are kept per process for ``/api/metrics/`` and each search
+is logged at DEBUG on the ``portal.search`` logger.
+"""
+
+import logging
+import re
+import threading
+
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.db.models.lookups import Exact
+
+from .models import CustomerSubscription, PaymentRecord
+
+logger = logging.getLogger(__name__)
+
+FREE_TEXT = "free_text"
+
+EXTERNAL_ID_RE = re.compile(r"^[A-Za-z]{2,10}-\d{4,}$")
+EXTERNAL_ID_PREFIX_RE = re.compile(r"^[A-Za-z]{2,10}-\d{0,3}$")
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+PAYMENT_ID_RE = re.compile(r"^pay_\w+$")
+# Single token mixing letters/digits, e.g. a bank reference.
+IDENTIFIER_RE = re.compile(r"^(?=.*\d)[\w-]{6,}$")
+
+SUBSCRIPTION_SEARCH_FIELDS = ("external_id", "product", "email", "username", "subscription_type_text", "status_text")
+PAYMENT_SEARCH_FIELDS = ("name", "email", "reference_number", "payment_id", "status_text")
+# Columns stored as integer codes: the term is matched against their labels here and the
+# matching codes are filtered with ``IN``.
+SUBSCRIPTION_CODE_FIELDS = {
+    "subscription_type": CustomerSubscription.SubscriptionType,
+    "status": CustomerSubscription.Status,
+}
+PAYMENT_CODE_FIELDS = {"status": PaymentRecord.Status}
+
+_route_stats = {}
+_route_stats_lock = threading.Lock()
+
+
+def classify_subscription_term(term):
+    """Return ``(route, condition)`` for a customer search; ``condition`` is None for free text."""
+    if EXTERNAL_ID_RE.match(term):
+        return "external_id", Q(external_id=term.upper())
+    if EXTERNAL_ID_PREFIX_RE.match(term):
+        return "external_id_prefix", Q(external_id__startswith=term.upper())
+    if EMAIL_RE.match(term):
+        return "email", Q(Exact(Lower("email"), term.lower()))
+    return FREE_TEXT, None
+
+
+def classify_payment_term(term):
+    """Return ``(route, condition)`` for a payment search; ``condition`` is None for free text."""
+    if EMAIL_RE.match(term):
+        return "email", Q(Exact(Lower("email"), term.lower()))
+    if PAYMENT_ID_RE.match(term):
+        return "payment_id", Q(payment_id__startswith=term)
+    if IDENTIFIER_RE.match(term):
+        return "identifier", Q(payment_id=term) | Q(Exact(Lower("reference_number"), term.lower()))
+    return FREE_TEXT, None
+
+
+def _contains_any(fields, term, code_fields=None):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": term})
+    for field, choices in (code_fields or {}).items():
+        codes = [member for member in choices if member != choices.OTHER and term.lower() in member.label.lower()]
+        if codes:
+            condition |= Q(**{f"{field}__in": codes})
+    return condition
+
+
+def _route(queryset, route, condition, free_text):
+    if condition is not None:
+        # No substring fallback for routed terms; see the module docstring.
+        return queryset.filter(condition), route
+    return queryset.filter(free_text), route
+
+
+def search_subscriptions(queryset, term):
+    """Filter ``queryset`` by ``term``; returns ``(queryset, route)``."""
+    term = term.strip()
+    if not term:
+        return queryset, None
+
+    free_text = _contains_any(SUBSCRIPTION_SEARCH_FIELDS, term, SUBSCRIPTION_CODE_FIELDS)
+    return _route(queryset, *classify_subscription_term(term), free_text)
+
+
+def search_payments(queryset, term):
+    """Filter ``queryset`` by ``term``; returns ``(queryset, route)``."""
+    term = term.strip()
+    if not term:
+        return queryset, None
+    free_text = _contains_any(PAYMENT_SEARCH_FIELDS, term, PAYMENT_CODE_FIELDS)
+    return _route(queryset, *classify_payment_term(term), free_text)
+
+
+def record_timing(table, route, seconds):
+    """Record how long a routed search took, classification through fetching the page."""
+    elapsed_ms = seconds * 1000
+    key = f"{table}:{route}"
+    with _route_stats_lock:
+        entry = _route_stats.setdefault(key, {"count": 0, "ms_total": 0.0, "ms_max": 0.0})
+        entry["count"] += 1
+        entry["ms_total"] += elapsed_ms
+        entry["ms_max"] = max(entry["ms_max"], elapsed_ms)
+    logger.debug("Search on %s routed to %s in %.1f ms", table, route, elapsed_ms,
+                 extra={"search_table": table, "search_route": route, "search_ms": round(elapsed_ms, 3)})
+
+
+def stats():
+    with _route_stats_lock:
+        return {
+            key: {
+                "count": entry["count"],
+                "ms_avg": round(entry["ms_total"] / entry["count"], 3),
+                "ms_max": round(entry["ms_max"], 3),
+            }
+            for key, entry in sorted(_route_stats.items())
+        }
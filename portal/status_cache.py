@@ -0,0 +1,117 @@
+"""
+Read-through cache of ``CustomerSubscription.status`` keyed by normalized (product, email).
+
+``check_user_details`` asks this cache first, so a warm hit never touches the database.
+A miss there always ends with a row for the pair (it inserts the FREE one), so only
+statuses are cached, never the absence of a row. Entries are dropped when a subscription
+changes: model signals cover ``save()``/``delete()`` (dashboard and admin), and the
+queryset-level writes in the API views call ``invalidate`` explicitly once their
+transaction commits.
+
+A reader that loaded the row before such a write committed may try to cache the old
+status after the invalidation ran. To stop that, ``invalidate`` leaves a short-lived
+tombstone in place of the entry and ``store`` only ever adds to an empty key, so the late
+write is dropped. While the tombstone lives (``PLUGHUB_STATUS_CACHE_TOMBSTONE_TTL``
+seconds, which should exceed the longest lookup) the pair is read from the database.
+
+Hit, miss and invalidation counters are kept per process and reported by ``stats()``.
+"""
+
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULT_TTL = 300
+DEFAULT_TOMBSTONE_TTL = 5
+
+TOMBSTONE = "__invalidated__"
+
+_counters = {"hits": 0, "misses": 0, "invalidations": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _counters_lock:
+        _counters[name] += amount
+
+
+def stats():
+    with _counters_lock:
+        return dict(_counters)
+
+
+def enabled():
+    return _ttl() > 0
+
+
+def _ttl():
+    return getattr(settings, "PLUGHUB_STATUS_CACHE_TTL", DEFAULT_TTL)
+
+
+def _cache():
+    return caches[getattr(settings, "PLUGHUB_STATUS_CACHE_ALIAS", "default")]
+
+
+def cache_key(product, email):
+    normalized = f"{(product or '').strip().lower()}\n{(email or '').strip().lower()}"
+    return f"substatus:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+
+def _record_lookup(value):
+    if value is None or value == TOMBSTONE:
+        _count("misses")
+        return None
+    _count("hits")
+    return value
+
+
+def get(product, email):
+    """Return the cached status label, or None if it has to be read from the database."""
+    if not enabled():
+        return None
+    return _record_lookup(_cache().get(cache_key(product, email)))
+
+
+async def aget(product, email):
+    if not enabled():
+        return None
+    return _record_lookup(await _cache().aget(cache_key(product, email)))
+
+
+def store(product, email, status):
+    """Cache ``status`` unless the key holds an entry or a tombstone already."""
+    if not enabled():
+        return
+    _cache().add(cache_key(product, email), status, timeout=_ttl())
+
+
+async def astore(product, email, status):
+    if not enabled():
+        return
+    await _cache().aadd(cache_key(product, email), status, timeout=_ttl())
+
+
+def invalidate(*pairs):
+    """Replace the entries for ``(product, email)`` pairs with tombstones once the current transaction commits."""
+    keys = [cache_key(product, email) for product, email in pairs]
+    if not keys or not enabled():
+        return
+
+    def _bury():
+        ttl = getattr(settings, "PLUGHUB_STATUS_CACHE_TOMBSTONE_TTL", DEFAULT_TOMBSTONE_TTL)
+        _cache().set_many(dict.fromkeys(keys, TOMBSTONE), timeout=ttl)
+        _count("invalidations", len(keys))
+
+    transaction.on_commit(_bury)
+
+
+def subscription_changed(sender, instance, **kwargs):
+    """post_save/post_delete receiver: drop the entry for the row's current and loaded keys."""
+    pairs = {(instance.product, instance.email)}
+    loaded = getattr(instance, "_loaded_status_key", None)
+    if loaded:
+        pairs.add(loaded)
+    invalidate(*pairs)
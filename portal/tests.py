@@ -1,3 +1,680 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import ingest, pagination, partitions, search, status_cache, throttling
+from .models import ArchivedPayment, CustomerSubscription, PaymentEvent, PaymentRecord
+
+API_KEY = "test-key"
+# Limits high enough that no test but the rate-limit ones ever sees a 429.
+API_SETTINGS = {"PLUGHUB_API_KEYS": {"tests": {"key": API_KEY}}, "PLUGHUB_RATE_LIMITS": {"default": "100000/60"}}
+
+
+def make_subscription(external_id, email, **values):
+    values.setdefault("product", "portal-tests")
+    values.setdefault("username", "")
+    values.setdefault("subscription_type", CustomerSubscription.SubscriptionType.MONTHLY)
+    values.setdefault("status", CustomerSubscription.Status.FREE)
+    return CustomerSubscription.objects.create(external_id=external_id, email=email, last_login=timezone.now(), **values)
+
+
+def make_payment(payment_id, reference, **values):
+    values.setdefault("name", "Ana Reyes")
+    values.setdefault("email", "ana@example.com")
+    values.setdefault("amount", Decimal("499.00"))
+    values.setdefault("status", PaymentRecord.Status.PAID)
+    return PaymentRecord.objects.create(payment_id=payment_id, reference_number=reference, **values)
+
+
+def payment_values(payment_id, status, reference=None):
+    return {
+        "name": "Ana Reyes",
+        "email": "ana@example.com",
+        "amount": Decimal("499.00"),
+        "reference_number": reference or f"REF-{payment_id}",
+        "payment_id": payment_id,
+        "status": status,
+    }
+
+
+def payment_item(payment_id, status, reference=None):
+    """A flat log_payments body, as API callers send it."""
+    return {
+        "name": "Ana Reyes",
+        "email": "ana@example.com",
+        "amount": "499.00",
+        "reference": reference or f"REF-{payment_id}",
+        "paymentid": payment_id,
+        "status": status,
+    }
+
+
+def run_concurrently(count, target):
+    """Run ``target(index)`` in ``count`` threads that start together; returns results and errors."""
+    barrier = threading.Barrier(count)
+    results, errors = [None] * count, []
+
+    def run(index):
+        try:
+            barrier.wait()
+            results[index] = target(index)
+        except Exception as exc:  # noqa: BLE001 - reported by the test
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def api_post(client, path, body, key=API_KEY):
+    return client.post(path, data=json.dumps(body), content_type="application/json", secure=True, HTTP_X_API_KEY=key)
+
+
+class SubscriptionLookupPlanTests(TestCase):
+    def test_product_email_lookup_uses_an_index(self):
+        make_subscription("GAC-0001", "a@x.com", product="gmail-addon-cleaner")
+        with connection.cursor() as cursor:
+            # The table is tiny, so make any usable index win; only a missing one leaves a Seq Scan.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = CustomerSubscription.objects.for_product_email(" Gmail-Addon-Cleaner", "A@X.com ").explain()
+        self.assertNotIn("Seq Scan", plan)
+        self.assertIn("portal_sub_product_email_uniq", plan)
+
+
+class SearchRoutingTests(TestCase):
+    """Routed searches use their column's index alone; every row they find matches the broad search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_subscription("GAC-0001", "a@x.com")
+        # The routed values also occur inside other rows.
+        make_subscription("ZZZ-0001", "ba@x.com")
+        make_subscription("TST-2045", "c@x.com")
+        make_subscription("TST-20451", "d@x.com")
+        make_subscription("PIX-0007", "e@x.com", username="tst-2045-old")
+        make_payment("pay_abc", "REF12345")
+        make_payment("pay_abcdef", "XREF12345", email="ref12345@x.com")
+        make_payment("pay_zzz", "ZZ999999", name="Paid via pay_abc")
+
+    def assert_within_broad(self, model, term):
+        if model is CustomerSubscription:
+            routed, route = search.search_subscriptions(model.objects.all(), term)
+            fields, code_fields = search.SUBSCRIPTION_SEARCH_FIELDS, search.SUBSCRIPTION_CODE_FIELDS
+        else:
+            routed, route = search.search_payments(model.objects.all(), term)
+            fields, code_fields = search.PAYMENT_SEARCH_FIELDS, search.PAYMENT_CODE_FIELDS
+        broad = model.objects.filter(search._contains_any(fields, term, code_fields))
+        self.assertNotEqual(route, search.FREE_TEXT, term)
+        self.assertTrue(routed.exists(), term)
+        self.assertLessEqual(set(routed.values_list("pk", flat=True)), set(broad.values_list("pk", flat=True)), term)
+
+    def test_subscription_routes_stay_within_broad_search(self):
+        for term in ("a@x.com", "TST-2045", "tst-2045", "TST-20", "GAC-"):
+            with self.subTest(term=term):
+                self.assert_within_broad(CustomerSubscription, term)
+
+    def test_payment_routes_stay_within_broad_search(self):
+        for term in ("pay_abc", "REF12345", "ref12345", "ref12345@x.com"):
+            with self.subTest(term=term):
+                self.assert_within_broad(PaymentRecord, term)
+
+    def test_routed_terms_only_search_their_column(self):
+        subscriptions = CustomerSubscription.objects.filter(product="portal-tests").order_by("external_id")
+        routed, _ = search.search_subscriptions(subscriptions, "a@x.com")
+        self.assertEqual(list(routed.values_list("external_id", flat=True)), ["GAC-0001"])
+        routed, _ = search.search_subscriptions(subscriptions, "tst-2045")
+        self.assertEqual(list(routed.values_list("external_id", flat=True)), ["TST-2045"])
+        routed, _ = search.search_payments(PaymentRecord.objects.order_by("payment_id"), "pay_abc")
+        self.assertEqual(list(routed.values_list("payment_id", flat=True)), ["pay_abc", "pay_abcdef"])
+        # A fragment without the routed shape falls back to the substring search.
+        routed, route = search.search_subscriptions(subscriptions, "a@x")
+        self.assertEqual(route, search.FREE_TEXT)
+        self.assertEqual(list(routed.values_list("external_id", flat=True)), ["GAC-0001", "ZZZ-0001"])
+
+    def test_routed_terms_skip_the_substring_search(self):
+        # "~~" is LIKE, which only the substring arms (served by the trigram indexes) use.
+        routed, _ = search.search_subscriptions(CustomerSubscription.objects.all(), "a@x.com")
+        self.assertNotIn("~~", routed.explain())
+        routed, _ = search.search_payments(PaymentRecord.objects.all(), "REF12345")
+        self.assertNotIn("~~", routed.explain())
+
+
+@override_settings(**API_SETTINGS)
+class StatusCacheTests(TestCase):
+    product = "gmail-addon-cleaner"
+    email = "cache@example.com"
+
+    def setUp(self):
+        status_cache._cache().clear()
+
+    def check(self):
+        response = api_post(self.client, "/api/checkuserdetails/", {"product": self.product, "email": self.email})
+        return response.json()["data"]["status"]
+
+    def test_consume_is_visible_on_next_check(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.check(), "FREE")
+        self.assertEqual(status_cache.get(self.product, self.email), "Free")
+        make_payment("pay_cache", "CACHEREF1", email=self.email)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = api_post(
+                self.client,
+                "/api/licenseconsume/",
+                {"product": self.product, "reference": "cacheref1", "email": self.email},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.check(), "PAID")
+
+    def test_late_store_of_a_stale_status_is_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.check()
+        stale = CustomerSubscription.objects.for_product_email(self.product, self.email).get().get_status_display()
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomerSubscription.objects.for_product_email(self.product, self.email).update(
+                status=CustomerSubscription.Status.PAID
+            )
+            status_cache.invalidate((self.product, self.email))
+        # A lookup that read the row before the update finishes after the invalidation.
+        status_cache.store(self.product, self.email, stale)
+        self.assertIsNone(status_cache.get(self.product, self.email))
+        self.assertEqual(self.check(), "PAID")
+
+
+def paymongo_event(payment_id, status, reference):
+    return {
+        "data": {
+            "type": "event",
+            "attributes": {
+                "type": "payment.paid",
+                "data": {
+                    "id": payment_id,
+                    "type": "payment",
+                    "attributes": {
+                        "amount": 49900,
+                        "status": status,
+                        "billing": {"name": "Ana Reyes", "email": "Ana@Example.com"},
+                        "source": {"reference_number": reference},
+                    },
+                },
+            },
+        }
+    }
+
+
+@override_settings(**API_SETTINGS)
+class LogPaymentsTests(TestCase):
+    def test_paymongo_event_keeps_its_status_text(self):
+        response = api_post(self.client, "/api/logpayments/", paymongo_event("pay_evt1", "succeeded", "EVTREF1"))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["data"]["status"], "succeeded")
+        record = PaymentRecord.objects.get(payment_id="pay_evt1")
+        self.assertEqual((record.status, record.status_text), (PaymentRecord.Status.OTHER, "succeeded"))
+        self.assertEqual((record.email, record.amount), ("ana@example.com", Decimal("499.00")))
+
+
+@override_settings(**API_SETTINGS)
+class LogPaymentsBatchTests(TestCase):
+    def post_batch(self, items):
+        response = api_post(self.client, "/api/logpayments/batch/", items)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["data"]
+
+    def test_out_of_order_pair_keeps_the_furthest_status(self):
+        data = self.post_batch([payment_item("pay_batch", "Paid"), payment_item("pay_batch", "Pending")])
+        self.assertEqual(data["failed"], 0)
+        self.assertEqual(PaymentRecord.objects.get(payment_id="pay_batch").status, PaymentRecord.Status.PAID)
+
+    def test_bad_item_fails_alone(self):
+        numeric = {**payment_item("pay_num", "Paid"), "reference": 20451, "name": 7}
+        nested = {**payment_item("pay_nested", "Paid"), "paymentid": {"id": "pay_nested"}}
+        data = self.post_batch([payment_item("pay_ok", "Paid"), nested, numeric])
+
+        self.assertEqual((data["accepted"], data["failed"]), (2, 1))
+        self.assertEqual(data["results"][1], {"index": 1, "error": "Field paymentid must be text"})
+        self.assertEqual(data["results"][2]["reference"], "20451")
+        self.assertEqual(
+            sorted(PaymentRecord.objects.values_list("payment_id", flat=True)), ["pay_num", "pay_ok"]
+        )
+
+
+class PaymentUpsertOrderingTests(TestCase):
+    def test_late_pending_does_not_downgrade_paid(self):
+        PaymentRecord.objects.upsert_by_payment_id(**payment_values("pay_order", PaymentRecord.Status.PENDING))
+        PaymentRecord.objects.upsert_by_payment_id(**payment_values("pay_order", PaymentRecord.Status.PAID))
+        record, created = PaymentRecord.objects.upsert_by_payment_id(
+            **payment_values("pay_order", PaymentRecord.Status.PENDING)
+        )
+        self.assertFalse(created)
+        self.assertEqual(record.status, PaymentRecord.Status.PAID)
+        self.assertEqual(PaymentRecord.objects.get(payment_id="pay_order").status, PaymentRecord.Status.PAID)
+
+    def test_batch_redelivery_does_not_downgrade(self):
+        PaymentRecord.objects.bulk_upsert_by_payment_id(
+            [payment_values("pay_b1", PaymentRecord.Status.PAID), payment_values("pay_b2", PaymentRecord.Status.PENDING)]
+        )
+        records = PaymentRecord.objects.bulk_upsert_by_payment_id(
+            [payment_values("pay_b1", PaymentRecord.Status.PENDING), payment_values("pay_b2", PaymentRecord.Status.PAID)]
+        )
+        self.assertEqual(
+            {record.payment_id: record.status for record in records},
+            {"pay_b1": PaymentRecord.Status.PAID, "pay_b2": PaymentRecord.Status.PAID},
+        )
+        self.assertEqual(PaymentRecord.objects.filter(status=PaymentRecord.Status.PAID).count(), 2)
+
+    def test_refund_is_final_and_replays_are_idempotent(self):
+        for status in (PaymentRecord.Status.PAID, PaymentRecord.Status.REFUNDED, PaymentRecord.Status.PAID):
+            record, _ = PaymentRecord.objects.upsert_by_payment_id(**payment_values("pay_refund", status))
+        self.assertEqual(record.status, PaymentRecord.Status.REFUNDED)
+
+
+class ConcurrentPaymentReplayTests(TransactionTestCase):
+    def test_concurrent_replays_keep_one_row_and_never_downgrade(self):
+        statuses = [PaymentRecord.Status.PAID, PaymentRecord.Status.PENDING] * 6
+
+        def deliver(index):
+            return PaymentRecord.objects.upsert_by_payment_id(**payment_values("pay_replay", statuses[index]))[1]
+
+        created, errors = run_concurrently(len(statuses), deliver)
+        self.assertEqual(errors, [])
+        self.assertEqual(created.count(True), 1)
+        self.assertEqual(PaymentRecord.objects.filter(payment_id="pay_replay").count(), 1)
+        self.assertEqual(PaymentRecord.objects.get(payment_id="pay_replay").status, PaymentRecord.Status.PAID)
+
+
+class PaymentEventDrainTests(TestCase):
+    def enqueue(self, body):
+        return ingest.enqueue_event(json.dumps(body).encode())
+
+    def test_out_of_order_deliveries_in_one_batch_keep_the_furthest_status(self):
+        self.enqueue(payment_item("pay_drain", "Paid"))
+        self.enqueue(payment_item("pay_drain", "Pending"))
+        self.assertEqual(ingest.drain_events(), (2, 0))
+        self.assertEqual(PaymentRecord.objects.get(payment_id="pay_drain").status, PaymentRecord.Status.PAID)
+
+    def test_bad_event_fails_alone_and_nothing_is_drained_twice(self):
+        good = self.enqueue(payment_item("pay_good", "Paid"))
+        bad = self.enqueue({"paymentid": "pay_bad"})
+        self.assertEqual(ingest.drain_events(), (1, 1))
+        self.assertEqual(ingest.drain_events(), (0, 0))
+
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual(good.payment.payment_id, "pay_good")
+        self.assertEqual(good.last_error, "")
+        self.assertIn("Missing fields", bad.last_error)
+        self.assertIsNone(bad.payment)
+        self.assertEqual(PaymentEvent.objects.filter(processed_at__isnull=True).count(), 0)
+
+
+class ConsumeTests(TestCase):
+    def test_case_variants_are_consumed_one_at_a_time(self):
+        make_payment("pay_upper", "ABC123")
+        make_payment("pay_lower", "abc123")
+        first = PaymentRecord.objects.consume("Abc123")
+        self.assertEqual(PaymentRecord.objects.filter(used=True).count(), 1)
+        second = PaymentRecord.objects.consume("abc123")
+        self.assertEqual({first.payment_id, second.payment_id}, {"pay_upper", "pay_lower"})
+        self.assertIsNone(PaymentRecord.objects.consume("ABC123"))
+
+    def test_consume_many_takes_one_row_per_reference(self):
+        make_payment("pay_upper", "ABC123")
+        make_payment("pay_lower", "abc123")
+        make_payment("pay_other", "XYZ789")
+        consumed = PaymentRecord.objects.consume_many(["abc123", "ABC123", "xyz789", "missing"])
+        self.assertEqual(len(consumed), 2)
+        self.assertEqual(PaymentRecord.objects.filter(used=True).count(), 2)
+
+
+@override_settings(**API_SETTINGS)
+class LicenseConsumeBatchTests(TestCase):
+    def test_batch_consumes_each_reference_once_and_upgrades_the_buyer(self):
+        make_payment("pay_ba", "BATCH-A")
+        make_payment("pay_bb", "BATCH-B")
+        make_payment("pay_bu", "BATCH-USED", used=True, date_consumed=timezone.now())
+        body = {
+            "product": "Gmail-Addon-Cleaner",
+            "email": "Batch@Example.com",
+            "references": ["batch-a", "BATCH-B", "BATCH-USED", "BATCH-NONE", "Batch-A"],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = api_post(self.client, "/api/licenseconsume/batch/", body)
+        self.assertEqual(response.status_code, 200, response.content)
+        # Every reference is consumed by one set-based statement.
+        updates = [query for query in queries if query["sql"].startswith('UPDATE "portal_paymentrecord"')]
+        self.assertEqual(len(updates), 1)
+
+        results = response.json()["data"]["results"]
+        self.assertEqual([result["reference"] for result in results[:2]], ["BATCH-A", "BATCH-B"])
+        self.assertTrue(all(result["used"] and result["email"] == "batch@example.com" for result in results[:2]))
+        self.assertEqual(
+            [result.get("error") for result in results[2:]],
+            ["Resource not found", "Reference not found", "Resource not found"],
+        )
+        self.assertEqual(PaymentRecord.objects.filter(used=True).count(), 3)
+        subscription = CustomerSubscription.objects.for_product_email("gmail-addon-cleaner", "batch@example.com").get()
+        self.assertEqual(subscription.status, CustomerSubscription.Status.PAID)
+
+    def test_items_missing_fields_fail_alone(self):
+        make_payment("pay_bc", "BATCH-C")
+        items = [
+            {"product": "gmail-addon-cleaner", "reference": "BATCH-C", "email": "c@example.com"},
+            {"product": "gmail-addon-cleaner", "reference": "BATCH-D"},
+            "not an object",
+        ]
+        results = api_post(self.client, "/api/licenseconsume/batch/", items).json()["data"]["results"]
+        self.assertTrue(results[0]["used"])
+        self.assertEqual(results[1], {"reference": "BATCH-D", "error": "Product, reference, and email are required"})
+        self.assertIn("error", results[2])
+
+
+@override_settings(**API_SETTINGS)
+class StatusBatchTests(TestCase):
+    items = [
+        {"email": " Known@Example.com", "product": "Gmail-Addon-Cleaner"},
+        {"email": "missing@example.com", "product": "gmail-addon-cleaner"},
+        {"email": "legacy@example.com", "product": "plughub-ims"},
+        {"email": "no-product@example.com"},
+        {"email": "known@example.com", "product": "not-a-product"},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        make_subscription("TST-0101", "known@example.com", product="gmail-addon-cleaner",
+                          status=CustomerSubscription.Status.PAID)
+        make_subscription("TST-0102", "legacy@example.com", product="plughub-ims",
+                          status=CustomerSubscription.Status.OTHER, status_text="trial-2019")
+
+    def test_statuses_come_from_one_query_without_creating_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_post(self.client, "/api/checkuserdetails/batch/", self.items)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            response.json()["data"],
+            {
+                "statuses": {
+                    "gmail-addon-cleaner": {"known@example.com": "PAID", "missing@example.com": None},
+                    "plughub-ims": {"legacy@example.com": "TRIAL-2019"},
+                },
+                "invalid": [3, 4],
+            },
+        )
+        self.assertFalse(CustomerSubscription.objects.filter(email="missing@example.com").exists())
+
+    def test_create_missing_and_stream(self):
+        response = api_post(self.client, "/api/checkuserdetails/batch/?create_missing=1&stream=1", self.items[:2])
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [(line["email"], line["status"]) for line in lines],
+            [("known@example.com", "PAID"), ("missing@example.com", "FREE")],
+        )
+        self.assertTrue(CustomerSubscription.objects.for_product_email("gmail-addon-cleaner", "missing@example.com").exists())
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(7):
+            make_payment(f"pay_keyset{index}", f"REFKEY{index:03d}")
+        # Tied timestamps: the id tie-breaker alone must keep pages apart.
+        PaymentRecord.objects.update(created_at=timezone.now().replace(day=1, hour=12))
+        cls.expected = list(PaymentRecord.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        cls.user = get_user_model().objects.create_user("staff", password="unused")
+
+    def page_ids(self, cursor=None):
+        paginator = pagination.KeysetPaginator(PaymentRecord.objects.all(), ["-created_at", "-id"], 3)
+        page = paginator.page(cursor)
+        return [payment.id for payment in page], page
+
+    def test_walks_forward_and_back_across_ties(self):
+        first_ids, first = self.page_ids()
+        second_ids, second = self.page_ids(first.next_cursor)
+        last_ids, last = self.page_ids(second.next_cursor)
+        self.assertEqual(first_ids + second_ids + last_ids, self.expected)
+        self.assertIsNone(first.previous_cursor)
+        self.assertIsNone(last.next_cursor)
+        self.assertEqual(self.page_ids(last.previous_cursor)[0], second_ids)
+        self.assertEqual(self.page_ids(second.previous_cursor)[0], first_ids)
+
+    def test_garbage_cursor_gives_first_page(self):
+        for cursor in ("garbage", pagination.encode_cursor("n", ["not-a-date", 1])):
+            self.assertEqual(self.page_ids(cursor)[0], self.expected[:3])
+
+    @override_settings(PLUGHUB_DASHBOARD_EXACT_COUNT_THRESHOLD=0)
+    def test_dashboard_table_pages_without_count(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dashboard/table/payments/?format=json", secure=True)
+        data = response.json()["data"]
+        self.assertEqual([row["id"] for row in data["rows"]], self.expected[:5])
+        self.assertTrue(data["count_approximate"])
+        self.assertFalse([query["sql"] for query in queries if "COUNT(" in query["sql"].upper()])
+        response = self.client.get(
+            "/dashboard/table/payments/", {"format": "json", "pay_cursor": data["next_cursor"]}, secure=True
+        )
+        self.assertEqual([row["id"] for row in response.json()["data"]["rows"]], self.expected[5:])
+
+
+class DashboardFragmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_subscription("TST-0201", "fragment@example.com")
+        make_payment("pay_fragment", "REFFRAG001")
+        cls.user = get_user_model().objects.create_user("staff", password="unused")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_dashboard_only_queries_the_active_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dashboard/", {"tab": "customers"}, secure=True)
+        self.assertContains(response, "/dashboard/table/payments/")
+        self.assertFalse([query["sql"] for query in queries if "portal_paymentrecord" in query["sql"]])
+
+    @override_settings(PLUGHUB_DASHBOARD_FRAGMENT_MAX_AGE=30)
+    def test_fragment_serves_the_other_table(self):
+        response = self.client.get("/dashboard/table/payments/", {"format": "json"}, secure=True)
+        data = response.json()["data"]
+        self.assertEqual(data["tab"], "payments")
+        self.assertEqual([row["payment_id"] for row in data["rows"]], ["pay_fragment"])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age=30", response["Cache-Control"])
+
+        response = self.client.get("/dashboard/table/payments/", secure=True)
+        self.assertContains(response, "REFFRAG001")
+        self.assertNotContains(response, "fragment@example.com")
+
+    def test_unknown_table_is_not_found(self):
+        self.assertEqual(self.client.get("/dashboard/table/users/", secure=True).status_code, 404)
+
+
+@override_settings(**API_SETTINGS)
+class ArchivePaymentsTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.old = make_payment("pay_archive_old", "REFARCH001", used=True, date_consumed=now - timedelta(days=200))
+        make_payment("pay_archive_recent", "REFARCH002", used=True, date_consumed=now - timedelta(days=10))
+        make_payment("pay_archive_unused", "REFARCH003")
+        self.event = PaymentEvent.objects.create(payload=b"{}", payment=self.old)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command("archive_payments", "--older-than-days=180", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_only_reports(self):
+        self.assertIn("1 payment(s)", self.archive("--dry-run"))
+        self.assertFalse(ArchivedPayment.objects.exists())
+
+    def test_moves_old_consumed_payments(self):
+        self.assertIn("Archived 1 payment(s)", self.archive("--batch-size=1"))
+        self.assertEqual(
+            sorted(PaymentRecord.objects.values_list("payment_id", flat=True)),
+            ["pay_archive_recent", "pay_archive_unused"],
+        )
+        archived = ArchivedPayment.objects.get()
+        self.assertEqual((archived.payment_id, archived.reference_number), ("pay_archive_old", "REFARCH001"))
+        self.event.refresh_from_db()
+        self.assertIsNone(self.event.payment_id)
+
+    def test_archived_reference_still_reads_as_used(self):
+        self.archive()
+        body = {"product": "plughub-ims", "reference": "refarch001", "email": "ana@example.com"}
+        response = api_post(self.client, "/api/licenseconsume/", body)
+        self.assertEqual((response.status_code, response.json()), (404, {"error": "Resource not found"}))
+        response = api_post(self.client, "/api/licenseconsume/", {**body, "reference": "REFARCH999"})
+        self.assertEqual(response.json(), {"error": "Reference not found"})
+
+
+class PaymentPartitionTests(TestCase):
+    future = datetime(2090, 1, 15, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.default_rows = partitions.default_partition_rows()
+        make_payment("pay_partition", "REFPART001")
+        PaymentRecord.objects.filter(payment_id="pay_partition").update(created_at=self.future)
+
+    def test_new_month_takes_rows_from_the_default_partition(self):
+        self.assertEqual(partitions.default_partition_rows(), self.default_rows + 1)
+        self.assertEqual(
+            partitions.ensure_partitions(months_ahead=0, now=self.future), [("portal_paymentrecord_p209001", 1)]
+        )
+        self.assertEqual(partitions.attached_partitions()[date(2090, 1, 1)], "portal_paymentrecord_p209001")
+        self.assertEqual(partitions.default_partition_rows(), self.default_rows)
+        self.assertEqual(PaymentRecord.objects.get(payment_id="pay_partition").created_at, self.future)
+        self.assertEqual(partitions.ensure_partitions(months_ahead=0, now=self.future), [])
+
+        # Uniqueness across months still holds once the rows were moved.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_payment("pay_partition_copy", "REFPART001")
+
+    def test_retire_keeps_months_with_unused_payments(self):
+        partitions.ensure_partitions(months_ahead=0, now=self.future)
+        later = datetime(2090, 6, 1, tzinfo=dt_timezone.utc)
+        actions = dict(partitions.retire_partitions(retain_months=1, now=later, dry_run=True))
+        self.assertEqual(actions["portal_paymentrecord_p209001"], "kept")
+        self.assertEqual(set(actions.values()) - {"kept"}, {"dropped"})
+
+        PaymentRecord.objects.update(used=True, date_consumed=timezone.now())
+        actions = dict(partitions.retire_partitions(retain_months=1, now=later, dry_run=True))
+        self.assertEqual(actions["portal_paymentrecord_p209001"], "detached")
+        self.assertIn(date(2090, 1, 1), partitions.attached_partitions())
+
+
+@override_settings(**API_SETTINGS)
+class ConcurrentConsumeTests(TransactionTestCase):
+    def test_parallel_consumes_succeed_exactly_once(self):
+        make_payment("pay_stress", "STRESS-REF-1", email="stress@example.com")
+        casings = ["STRESS-REF-1", "stress-ref-1", "Stress-Ref-1", " stress-ref-1 "]
+
+        def consume(index):
+            response = api_post(
+                Client(),
+                "/api/licenseconsume/",
+                {
+                    "product": "gmail-addon-cleaner",
+                    "reference": casings[index % len(casings)],
+                    "email": "stress@example.com",
+                },
+            )
+            return response.status_code
+
+        statuses, errors = run_concurrently(16, consume)
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses.count(200), 1)
+        self.assertEqual(statuses.count(404), 15)
+        payment = PaymentRecord.objects.get(payment_id="pay_stress")
+        self.assertTrue(payment.used)
+        subscription = CustomerSubscription.objects.for_product_email("gmail-addon-cleaner", "stress@example.com").get()
+        self.assertEqual(subscription.status, CustomerSubscription.Status.PAID)
+
+
+@override_settings(**API_SETTINGS)
+class ConcurrentSignupTests(TransactionTestCase):
+    def test_parallel_checks_create_one_row_per_pair(self):
+        pairs = [("gmail-addon-cleaner", f"signup{n}@example.com") for n in range(4)]
+        per_pair = 6
+
+        def check(index):
+            product, email = pairs[index % len(pairs)]
+            # Vary the casing so normalization is part of what is raced.
+            email = email.upper() if index % 2 else email
+            response = api_post(Client(), "/api/checkuserdetails/", {"product": product, "email": email})
+            return response.status_code, response.json()["data"]["status"]
+
+        results, errors = run_concurrently(len(pairs) * per_pair, check)
+        self.assertEqual(errors, [])
+        self.assertEqual([status for _, status in results], ["FREE"] * len(results))
+        self.assertEqual([code for code, _ in results].count(201), len(pairs))
+        for product, email in pairs:
+            self.assertEqual(CustomerSubscription.objects.for_product_email(product, email).count(), 1)
+        self.assertEqual(CustomerSubscription.objects.count(), len(pairs))
+
+
+WEBHOOK_SECRET = "whsk_tests"
+
+
+@override_settings(
+    PLUGHUB_API_KEYS={"a": {"key": "key-a"}, "b": {"key": "key-b"}},
+    PLUGHUB_RATE_LIMITS={"check_user_details": "3/60", "log_payments": "3/60", "paymongo_webhook": "3/60"},
+    PAYMONGO_WEBHOOK_SECRET=WEBHOOK_SECRET,
+)
+class RateLimitBucketTests(TestCase):
+    def setUp(self):
+        throttling.reset_limiter()
+        status_cache._cache().clear()
+
+    def check(self, key="key-a"):
+        body = {"product": "gmail-addon-cleaner", "email": "rl@example.com"}
+        return api_post(self.client, "/api/checkuserdetails/", body, key)
+
+    def log_payment(self, key="key-a"):
+        return api_post(self.client, "/api/logpayments/", {}, key)
+
+    def webhook(self):
+        body = b"{}"
+        timestamp = str(int(time.time()))
+        digest = hmac.new(WEBHOOK_SECRET.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            "/api/logpayments/",
+            data=body,
+            content_type="application/json",
+            secure=True,
+            HTTP_PAYMONGO_SIGNATURE=f"t={timestamp},v1={digest}",
+        )
+
+    def flood(self, send):
+        statuses = [send().status_code for _ in range(5)]
+        self.assertEqual(statuses[-1], 429, statuses)
+
+    def test_flooding_one_endpoint_leaves_another_alone(self):
+        self.flood(self.log_payment)
+        self.assertNotEqual(self.check().status_code, 429)
+
+    def test_each_api_key_has_its_own_bucket(self):
+        self.flood(lambda: self.check("key-a"))
+        self.assertNotEqual(self.check("key-b").status_code, 429)
+
+    def test_webhook_flood_leaves_api_key_callers_alone(self):
+        self.flood(self.webhook)
+        self.assertNotEqual(self.log_payment().status_code, 429)
+        self.assertNotEqual(self.check().status_code, 429)
@@ -0,0 +1,236 @@
+"""
+Rate limiting for the public API.
+
+Limits use a sliding-window counter: the count for the current fixed window is
+combined with the previous window's count, weighted by how much of the previous
+window still overlaps the sliding window. Two backends are provided:
+
+* ``LocalRateLimiter`` keeps counters in process memory. It is used automatically
+  when the rate-limit cache (``PLUGHUB_RATE_LIMIT_CACHE_ALIAS``) is ``LocMemCache``,
+  where a cache round trip buys nothing.
+* ``CacheRateLimiter`` keeps counters in that shared Django cache. Each request does a
+  single atomic ``incr`` on the current window; closed windows never change again, so
+  their totals are read at most once per process and memoized.
+
+Limits are strings of the form ``"<requests>/<seconds>"`` configured through
+``PLUGHUB_RATE_LIMITS`` (per scope) and each key's ``rate_limits`` in
+``PLUGHUB_API_KEYS`` (see ``portal.apikeys``). A scope
+is the view name, or ``paymongo_webhook`` for HMAC-verified PayMongo deliveries, and
+every scope counts requests in its own buckets.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_RATE = "60/60"
+PAYMONGO_WEBHOOK_SCOPE = "paymongo_webhook"
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests: int
+    window: int
+
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, RateLimit):
+            return value
+        requests, _, window = str(value).partition("/")
+        return cls(requests=int(requests), window=int(window or 60))
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int
+    retry_after: int
+
+    def headers(self):
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(self.reset_after),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def _evaluate(limit, now, current, previous):
+    """Apply the sliding-window estimate to the counts of the current and previous windows."""
+    window_start = (now // limit.window) * limit.window
+    elapsed = now - window_start
+    weight = 1 - (elapsed / limit.window)
+    estimated = previous * weight + current
+    allowed = estimated <= limit.requests
+    reset_after = max(1, math.ceil(limit.window - elapsed))
+    retry_after = 0
+    if not allowed:
+        if previous and current <= limit.requests:
+            # Wait until enough of the previous window has slid out of view.
+            needed = (estimated - limit.requests) / previous * limit.window
+            retry_after = max(1, min(math.ceil(needed), reset_after))
+        else:
+            retry_after = reset_after
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit.requests,
+        remaining=max(0, int(limit.requests - estimated)),
+        reset_after=reset_after,
+        retry_after=retry_after,
+    )
+
+
+class LocalRateLimiter:
+    """In-process sliding-window counters; limits apply per worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def hit(self, key, limit, now=None):
+        now = time.time() if now is None else now
+        window = int(now // limit.window)
+        with self._lock:
+            current_window, current, previous = self._counters.get(key, (window, 0, 0))
+            if current_window != window:
+                previous = current if current_window == window - 1 else 0
+                current = 0
+            current += 1
+            self._counters[key] = (window, current, previous)
+            if len(self._counters) > 10000:
+                self._prune(window)
+        return _evaluate(limit, now, current, previous)
+
+    async def ahit(self, key, limit, now=None):
+        # Pure in-memory bookkeeping; nothing to await.
+        return self.hit(key, limit, now)
+
+    def _prune(self, window):
+        stale = [key for key, (seen, _, _) in self._counters.items() if seen < window - 1]
+        for key in stale:
+            del self._counters[key]
+
+
+class CacheRateLimiter:
+    """Sliding-window counters stored in a shared Django cache."""
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._closed_windows = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def hit(self, key, limit, now=None):
+        now = time.time() if now is None else now
+        window = int(now // limit.window)
+        current = self._incr(f"ratelimit:{key}:{limit.window}:{window}", limit.window * 2)
+        previous = self._closed_window_count(f"ratelimit:{key}:{limit.window}:{window - 1}")
+        return _evaluate(limit, now, current, previous)
+
+    async def ahit(self, key, limit, now=None):
+        now = time.time() if now is None else now
+        window = int(now // limit.window)
+        current = await self._aincr(f"ratelimit:{key}:{limit.window}:{window}", limit.window * 2)
+        previous = await self._aclosed_window_count(f"ratelimit:{key}:{limit.window}:{window - 1}")
+        return _evaluate(limit, now, current, previous)
+
+    async def _aincr(self, cache_key, timeout):
+        try:
+            return await self.cache.aincr(cache_key)
+        except ValueError:
+            if await self.cache.aadd(cache_key, 1, timeout=timeout):
+                return 1
+            return await self.cache.aincr(cache_key)
+
+    async def _aclosed_window_count(self, cache_key):
+        count = self._memoized_window(cache_key)
+        if count is None:
+            count = self._memoize_window(cache_key, await self.cache.aget(cache_key) or 0)
+        return count
+
+    def _incr(self, cache_key, timeout):
+        try:
+            return self.cache.incr(cache_key)
+        except ValueError:
+            if self.cache.add(cache_key, 1, timeout=timeout):
+                return 1
+            return self.cache.incr(cache_key)
+
+    def _closed_window_count(self, cache_key):
+        count = self._memoized_window(cache_key)
+        if count is None:
+            count = self._memoize_window(cache_key, self.cache.get(cache_key) or 0)
+        return count
+
+    def _memoized_window(self, cache_key):
+        with self._lock:
+            return self._closed_windows.get(cache_key)
+
+    def _memoize_window(self, cache_key, count):
+        with self._lock:
+            if len(self._closed_windows) > 10000:
+                self._closed_windows.clear()
+            self._closed_windows[cache_key] = count
+        return count
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = _build_limiter()
+    return _limiter
+
+
+def reset_limiter():
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ("PLUGHUB_RATE_LIMIT_BACKEND", "PLUGHUB_RATE_LIMIT_CACHE_ALIAS", "CACHES"):
+        reset_limiter()
+
+
+def _build_limiter():
+    backend = getattr(settings, "PLUGHUB_RATE_LIMIT_BACKEND", "")
+    if backend:
+        return import_string(backend)()
+    alias = getattr(settings, "PLUGHUB_RATE_LIMIT_CACHE_ALIAS", "default")
+    if alias not in settings.CACHES:
+        alias = "default"
+    if isinstance(caches[alias], LocMemCache):
+        return LocalRateLimiter()
+    return CacheRateLimiter(alias)
+
+
+def get_rate_limit(scope, api_key=None):
+    """Resolve the limit for a scope, preferring the key's own quotas over scope defaults."""
+    if api_key is not None and scope != PAYMONGO_WEBHOOK_SCOPE:
+        rate = api_key.rate_limits.get(scope) or api_key.rate_limits.get("default")
+        if rate:
+            return RateLimit.parse(rate)
+    limits = getattr(settings, "PLUGHUB_RATE_LIMITS", {})
+    return RateLimit.parse(limits.get(scope) or limits.get("default") or DEFAULT_RATE)
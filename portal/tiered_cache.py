@@ -0,0 +1,178 @@
+"""
+Two-tier Django cache: a small in-process LRU in front of a shared cache.
+
+Configured as a cache whose ``LOCATION`` is the alias of the shared cache::
+
+    "default": {
+        "BACKEND": "portal.tiered_cache.TieredCache",
+        "LOCATION": "shared",
+        "OPTIONS": {"LOCAL_MAX_ENTRIES": 1024, "LOCAL_TIMEOUT": 5},
+    }
+
+Reads are answered from the local tier when possible and otherwise fetched from the
+shared cache and remembered locally for at most ``LOCAL_TIMEOUT`` seconds (or the
+entry's own timeout, if shorter). Once ``LOCAL_MAX_ENTRIES`` is reached the least
+recently used entry is evicted. Writes and deletes go to both tiers, but other processes
+keep their local copy until it expires, so ``LOCAL_TIMEOUT`` bounds how stale a read can
+be. Counters (``incr``/``decr``) always go to the shared cache and are never held
+locally, which keeps rate limiting exact. Local values are held by reference rather than
+pickled, so callers must not mutate what they read.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_LOCAL_MAX_ENTRIES = 1024
+DEFAULT_LOCAL_TIMEOUT = 5
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._shared_alias = location or "shared"
+        self._local_max_entries = int(options.get("LOCAL_MAX_ENTRIES", DEFAULT_LOCAL_MAX_ENTRIES))
+        self._local_timeout = float(options.get("LOCAL_TIMEOUT", DEFAULT_LOCAL_TIMEOUT))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0}
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, local_entries=len(self._local))
+
+    # Local tier
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _local_get(self, local_key):
+        with self._lock:
+            entry = self._local.get(local_key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._local[local_key]
+                return _MISSING
+            self._local.move_to_end(local_key)
+            self._stats["local_hits"] += 1
+            return value
+
+    def _local_set(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        if self._local_max_entries <= 0 or self._local_timeout <= 0:
+            return
+        ttl = self._local_timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            if timeout <= 0:
+                self._local_discard(local_key)
+                return
+            ttl = min(ttl, timeout)
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + ttl, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _local_discard(self, *local_keys):
+        with self._lock:
+            for local_key in local_keys:
+                self._local.pop(local_key, None)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count("misses")
+            return default
+        self._count("shared_hits")
+        self._local_set(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            value = self._local_get(self._local_key(key, version))
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            self._count("shared_hits", len(fetched))
+            self._count("misses", len(remote) - len(fetched))
+            for key, value in fetched.items():
+                self._local_set(self._local_key(key, version), value)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._local_set(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self._local_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._local_set(self._local_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_discard(self._local_key(key, version))
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_discard(self._local_key(key, version))
+        return self.shared.incr(key, delta=delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_discard(self._local_key(key, version))
+        return self.shared.decr(key, delta=delta, version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(self._local_key(key, version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._local_discard(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._local_discard(*(self._local_key(key, version) for key in keys))
+        return self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        return self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
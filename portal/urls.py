@@ -1,19 +1,40 @@
+from django.conf import settings
 from django.urls import path
 
-from .views import DashboardView, check_user_details, license_consume, log_payments
+from . import async_views, views
+from .views import (
+    DashboardTableView,
+    DashboardView,
+    api_metrics,
+    check_user_details_batch,
+    license_consume_batch,
+    log_payments_batch,
+)
 from django.views.generic import TemplateView
 
+# check_user_details, log_payments and license_consume have async variants for ASGI.
+api_views = async_views if getattr(settings, "PLUGHUB_ASYNC_API", False) else views
+
 app_name = "portal"
 
 urlpatterns = [
     path("dashboard/", DashboardView.as_view(), name="dashboard"),
     path("dashboard", DashboardView.as_view()),
-    path("api/checkuserdetails/", check_user_details, name="checkuserdetails"),
-    path("api/checkuserdetails", check_user_details),
-    path("api/logpayments/", log_payments, name="logpayments"),
-    path("api/logpayments", log_payments),  # allow no trailing slash (webhooks)
-    path("api/licenseconsume/", license_consume, name="licenseconsume"),
-    path("api/licenseconsume", license_consume),
+    path("dashboard/table/<str:tab>/", DashboardTableView.as_view(), name="dashboard_table"),
+    path("api/checkuserdetails/", api_views.check_user_details, name="checkuserdetails"),
+    path("api/checkuserdetails", api_views.check_user_details),
+    path("api/checkuserdetails/batch/", check_user_details_batch, name="checkuserdetails_batch"),
+    path("api/checkuserdetails/batch", check_user_details_batch),
+    path("api/logpayments/", api_views.log_payments, name="logpayments"),
+    path("api/logpayments", api_views.log_payments),  # allow no trailing slash (webhooks)
+    path("api/logpayments/batch/", log_payments_batch, name="logpayments_batch"),
+    path("api/logpayments/batch", log_payments_batch),
+    path("api/licenseconsume/", api_views.license_consume, name="licenseconsume"),
+    path("api/licenseconsume", api_views.license_consume),
+    path("api/licenseconsume/batch/", license_consume_batch, name="licenseconsume_batch"),
+    path("api/licenseconsume/batch", license_consume_batch),
+    path("api/metrics/", api_metrics, name="metrics"),
+    path("api/metrics", api_metrics),
     path("emailcleaner/", TemplateView.as_view(template_name="email_cleaner_home.html"), name="emailcleaner_home"),
     path("emailcleaner", TemplateView.as_view(template_name="email_cleaner_home.html")),
     path("emailcleaner/support/", TemplateView.as_view(template_name="support.html"), name="emailcleaner_support"),
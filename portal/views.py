@@ -1,31 +1,45 @@
 import json
-import secrets
-import string
-import hmac
-import hashlib
 import logging
-from decimal import Decimal, InvalidOperation
+import time
+from functools import wraps
 
+from asgiref.sync import iscoroutinefunction
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
-from django.core.cache import cache
+from django.core.cache import caches
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import TemplateView
 
+from . import (
+    apikeys,
+    dbtiming,
+    external_ids,
+    ingest,
+    pagination,
+    payloads,
+    paymongo,
+    search,
+    status_cache,
+    throttling,
+)
 from .forms import CustomerForm, PaymentForm
 from .models import CustomerSubscription, PaymentRecord
+from .tiered_cache import TieredCache
 
 
+DASHBOARD_TABS = ("customers", "payments")
+
 ALLOWED_PRODUCTS = {
     "gmail-addon-cleaner",
     "plughub-ims",
@@ -34,10 +48,6 @@ ALLOWED_PRODUCTS = {
 
 logger = logging.getLogger(__name__)
 
-# Simple throttle: limit requests per IP per minute for the public API.
-RATE_LIMIT_REQUESTS = 60
-RATE_LIMIT_WINDOW_SECONDS = 60
-
 
 class PortalLoginView(LoginView):
     template_name = "registration/login.html"
@@ -56,31 +66,20 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = "portal/dashboard.html"
     login_url = reverse_lazy("login")
 
+    search_route = None
+
     def get_queryset(self):
         query = self.request.GET.get("q")
         subscriptions = CustomerSubscription.objects.all()
         if query:
-            subscriptions = subscriptions.filter(
-                Q(external_id__icontains=query)
-                | Q(product__icontains=query)
-                | Q(email__icontains=query)
-                | Q(username__icontains=query)
-                | Q(subscription_type__icontains=query)
-                | Q(status__icontains=query)
-            )
+            subscriptions, self.search_route = search.search_subscriptions(subscriptions, query)
         return subscriptions.order_by("external_id")
 
     def get_payment_queryset(self):
         query = self.request.GET.get("pay_q")
         payments = PaymentRecord.objects.all()
         if query:
-            payments = payments.filter(
-                Q(name__icontains=query)
-                | Q(email__icontains=query)
-                | Q(reference_number__icontains=query)
-                | Q(payment_id__icontains=query)
-                | Q(status__icontains=query)
-            )
+            payments, self.search_route = search.search_payments(payments, query)
         return payments
 
     def get_page_obj(self, queryset, page_param, per_page=5):
@@ -94,41 +93,65 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             page_obj = paginator.page(paginator.num_pages)
         return paginator, page_obj
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        current_tab = self.request.GET.get("tab", "customers")
-        context["current_tab"] = current_tab
-
-        sub_queryset = self.get_queryset()
-        sub_paginator, sub_page_obj = self.get_page_obj(sub_queryset, "page")
+    def get_keyset_page(self, queryset, ordering, cursor_param, search_param, per_page=5):
+        """Cursor-paginated page plus ``(count, approximate)``; no count while a search is active."""
+        page_obj = pagination.KeysetPaginator(queryset, ordering, per_page).page(self.request.GET.get(cursor_param))
+        if self.request.GET.get(search_param):
+            return page_obj, (None, False)
+        return page_obj, pagination.table_count(queryset.model)
+
+    def get_table_context(self, tab):
+        """Rows, pagination and totals for one dashboard table; the other table is not queried."""
+        keyset = getattr(settings, "PLUGHUB_DASHBOARD_PAGINATION", "keyset") == "keyset"
+        started = time.perf_counter()
+        if tab == "payments":
+            queryset, ordering, search_param = self.get_payment_queryset(), ["-created_at", "-id"], "pay_q"
+            page_param = "pay_cursor" if keyset else "pay_page"
+        else:
+            queryset, ordering, search_param = self.get_queryset(), ["external_id"], "q"
+            page_param = "cursor" if keyset else "page"
 
-        pay_queryset = self.get_payment_queryset()
-        pay_paginator, pay_page_obj = self.get_page_obj(pay_queryset, "pay_page")
+        if keyset:
+            paginator = None
+            page_obj, count = self.get_keyset_page(queryset, ordering, page_param, search_param)
+        else:
+            paginator, page_obj = self.get_page_obj(queryset, page_param)
+            count = (paginator.count, False)
+        rows = list(page_obj.object_list)
+        if self.search_route:
+            search.record_timing(tab, self.search_route, time.perf_counter() - started)
 
         params = self.request.GET.copy()
-        params.pop("page", None)
-        context["querystring"] = params.urlencode()
+        params.pop(page_param, None)
+        return {
+            "pagination_mode": "keyset" if keyset else "offset",
+            "paginator": paginator,
+            "page_obj": page_obj,
+            "rows": rows,
+            "search_route": self.search_route,
+            "querystring": params.urlencode(),
+            "record_count": count[0],
+            "record_count_approximate": count[1],
+            "query": self.request.GET.get("q", ""),
+            "payment_query": self.request.GET.get("pay_q", ""),
+        }
 
-        pay_params = self.request.GET.copy()
-        pay_params.pop("pay_page", None)
-        context["pay_querystring"] = pay_params.urlencode()
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        current_tab = kwargs.get("current_tab") or self.request.GET.get("tab", "customers")
+        if current_tab not in DASHBOARD_TABS:
+            current_tab = "customers"
+        context["current_tab"] = current_tab
+        context.update(self.get_table_context(current_tab))
 
-        context["paginator"] = sub_paginator
-        context["page_obj"] = sub_page_obj
-        context["subscriptions"] = sub_page_obj.object_list
         context["form"] = kwargs.get("form") or CustomerForm()
         context["active_customer_id"] = kwargs.get("active_customer_id")
         context["form_mode"] = kwargs.get("form_mode") or "create"
-        context["query"] = self.request.GET.get("q", "")
         context["open_modal"] = kwargs.get("open_modal", False)
 
-        context["payments"] = pay_page_obj.object_list
-        context["payment_paginator"] = pay_paginator
-        context["payment_page_obj"] = pay_page_obj
         context["payment_form"] = kwargs.get("payment_form") or PaymentForm()
         context["active_payment_id"] = kwargs.get("active_payment_id")
         context["payment_form_mode"] = kwargs.get("payment_form_mode") or "create"
-        context["payment_query"] = self.request.GET.get("pay_q", "")
         context["open_payment_modal"] = kwargs.get("open_payment_modal", False)
         return context
 
@@ -172,6 +195,81 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         return self.render_to_response(self.get_context_data(**context))
 
 
+class DashboardTableView(DashboardView):
+    """
+    One dashboard table on its own, for loading the inactive tab lazily: the table's HTML
+    fragment, or its rows as JSON with ``?format=json`` (or ``Accept: application/json``).
+    Responses are private to the session and browser-cacheable for
+    ``PLUGHUB_DASHBOARD_FRAGMENT_MAX_AGE`` seconds.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    table_templates = {
+        "customers": "portal/partials/customers_table.html",
+        "payments": "portal/partials/payments_table.html",
+    }
+
+    def get(self, request, *args, **kwargs):
+        tab = kwargs["tab"]
+        if tab not in DASHBOARD_TABS:
+            raise Http404("Unknown dashboard table")
+        context = {"current_tab": tab, **self.get_table_context(tab)}
+        if request.GET.get("format") == "json" or "application/json" in request.headers.get("Accept", ""):
+            response = JsonResponse({"data": self.table_json(tab, context)})
+        else:
+            response = self.response_class(
+                request=request, template=[self.table_templates[tab]], context=context, using=self.template_engine
+            )
+        patch_cache_control(response, private=True, max_age=getattr(settings, "PLUGHUB_DASHBOARD_FRAGMENT_MAX_AGE", 0))
+        patch_vary_headers(response, ["Cookie", "Accept"])
+        return response
+
+    def table_json(self, tab, context):
+        page_obj = context["page_obj"]
+        if tab == "payments":
+            rows = [
+                {
+                    "id": payment.id,
+                    "name": payment.name,
+                    "email": payment.email,
+                    "amount": str(payment.amount),
+                    "reference_number": payment.reference_number,
+                    "payment_id": payment.payment_id,
+                    "status": payment.get_status_display(),
+                    "used": payment.used,
+                    "date_consumed": payment.date_consumed,
+                    "created_at": payment.created_at,
+                }
+                for payment in context["rows"]
+            ]
+        else:
+            rows = [
+                {
+                    "id": record.id,
+                    "external_id": record.external_id,
+                    "product": record.product,
+                    "email": record.email,
+                    "username": record.username,
+                    "last_login": record.last_login,
+                    "subscription_type": record.get_subscription_type_display(),
+                    "status": record.get_status_display(),
+                }
+                for record in context["rows"]
+            ]
+        data = {
+            "tab": tab,
+            "rows": rows,
+            "count": context["record_count"],
+            "count_approximate": context["record_count_approximate"],
+            "search_route": context["search_route"],
+        }
+        if context["pagination_mode"] == "keyset":
+            data.update(next_cursor=page_obj.next_cursor, previous_cursor=page_obj.previous_cursor)
+        else:
+            data.update(page=page_obj.number, num_pages=context["paginator"].num_pages)
+        return data
+
+
 def portal_logout_view(request):
     if request.user.is_authenticated:
         logout(request)
@@ -179,22 +277,117 @@ def portal_logout_view(request):
     return redirect("login")
 
 
+EXTERNAL_ID_ATTEMPTS = 3
+
+
 def _generate_external_id(product: str) -> str:
-    parts = [p for p in product.split("-") if p]
-    prefix = "".join(p[0].upper() for p in parts)[:3] or product[:3].upper() or "PHB"
-    if len(prefix) < 3:
-        prefix = prefix.ljust(3, "X")
-    while True:
-        suffix = "".join(secrets.choice(string.digits) for _ in range(4))
-        candidate = f"{prefix}-{suffix}"
-        if not CustomerSubscription.objects.filter(external_id=candidate).exists():
-            return candidate
-
-
-def _subscription_type_for_product(product: str) -> str:
+    return external_ids.allocator.allocate(external_ids.external_id_prefix(product))
+
+
+def _with_fresh_external_ids(write):
+    """
+    Run ``write()`` (which allocates the external IDs it inserts) in a savepoint, and run
+    it again if one of those IDs was meanwhile entered by hand through the dashboard or
+    the admin. The allocator's pool has moved past the taken number by then.
+    """
+    for attempt in range(1, EXTERNAL_ID_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                return write()
+        except IntegrityError as exc:
+            if attempt == EXTERNAL_ID_ATTEMPTS or not external_ids.is_taken_error(exc):
+                raise
+
+
+def _subscription_type_for_product(product: str) -> int:
     if product == "gmail-addon-cleaner":
-        return "One-time"
-    return "Monthly"
+        return CustomerSubscription.SubscriptionType.ONE_TIME
+    return CustomerSubscription.SubscriptionType.MONTHLY
+
+
+def _mark_subscription_paid(product: str, email: str):
+    """Upgrade the (product, email) subscription to a paid one-time license, creating it if needed."""
+    upgrade = {
+        "subscription_type": CustomerSubscription.SubscriptionType.ONE_TIME,
+        "subscription_type_text": "",
+        "status": CustomerSubscription.Status.PAID,
+        "status_text": "",
+        "updated_at": timezone.now(),
+    }
+    status_cache.invalidate((product, email))
+    if CustomerSubscription.objects.for_product_email(product, email).update(**upgrade):
+        return
+    created = _with_fresh_external_ids(
+        lambda: CustomerSubscription.objects.create_if_absent(
+            external_id=_generate_external_id(product),
+            product=product,
+            email=email,
+            username="",
+            last_login=timezone.now(),
+            subscription_type=CustomerSubscription.SubscriptionType.ONE_TIME,
+            status=CustomerSubscription.Status.PAID,
+        )
+    )
+    if created is None:
+        # A concurrent check_user_details inserted the row first; upgrade that one.
+        CustomerSubscription.objects.for_product_email(product, email).update(**upgrade)
+
+
+def _build_subscriptions(pairs, status, subscription_type=None):
+    """Unsaved subscriptions for (product, email) pairs, with external IDs reserved in bulk."""
+    now = timezone.now()
+    by_prefix = {}
+    for product, email in pairs:
+        by_prefix.setdefault(external_ids.external_id_prefix(product), []).append((product, email))
+    rows = []
+    for prefix, prefix_pairs in by_prefix.items():
+        # Rows that turn out to exist already keep their external ID, leaving gaps in the sequence.
+        for (product, email), external_id in zip(prefix_pairs, external_ids.allocator.allocate_many(prefix, len(prefix_pairs))):
+            rows.append(
+                CustomerSubscription(
+                    external_id=external_id,
+                    product=product,
+                    email=email,
+                    username="",
+                    last_login=now,
+                    subscription_type=subscription_type or _subscription_type_for_product(product),
+                    status=status,
+                )
+            )
+    return rows
+
+
+def _mark_subscriptions_paid(pairs):
+    """Set-based ``_mark_subscription_paid`` for distinct (product, email) pairs in one upsert."""
+    if not pairs:
+        return
+    _with_fresh_external_ids(
+        lambda: CustomerSubscription.objects.bulk_upsert(
+            _build_subscriptions(
+                pairs,
+                CustomerSubscription.Status.PAID,
+                subscription_type=CustomerSubscription.SubscriptionType.ONE_TIME,
+            ),
+            update_fields=["subscription_type", "subscription_type_text", "status", "status_text"],
+        )
+    )
+    status_cache.invalidate(*pairs)
+
+
+def _create_free_subscriptions(pairs):
+    """Insert FREE rows for pairs with no subscription; returns ``{(product, email): status}``."""
+    if not pairs:
+        return {}
+    inserted = _with_fresh_external_ids(
+        lambda: CustomerSubscription.objects.bulk_upsert(_build_subscriptions(pairs, CustomerSubscription.Status.FREE))
+    )
+    created = {(product, email): status for product, email, status in inserted}
+    status_cache.invalidate(*created)
+    raced = [pair for pair in pairs if pair not in created]
+    if raced:
+        # Inserted concurrently by someone else; report whatever they stored.
+        created.update(CustomerSubscription.objects.statuses_for(raced))
+    return created
 
 
 def _client_ip(request):
@@ -204,144 +397,94 @@ def _client_ip(request):
     return request.META.get("REMOTE_ADDR", "unknown")
 
 
-def _check_rate_limit(request):
-    ip = _client_ip(request)
-    cache_key = f"throttle:checkuser:{ip}"
-    current = cache.get(cache_key)
-    if current and current >= RATE_LIMIT_REQUESTS:
-        return False
-    if current is None:
-        cache.set(cache_key, 1, timeout=RATE_LIMIT_WINDOW_SECONDS)
-    else:
-        cache.incr(cache_key)
-    return True
+def _supplied_api_key(request):
+    return request.headers.get("X-Api-Key") or request.META.get("HTTP_X_API_KEY")
 
 
-def _check_api_key(request):
-    supplied = request.headers.get("X-Api-Key") or request.META.get("HTTP_X_API_KEY")
-    if not supplied:
-        return False
-    allowed = getattr(settings, "PLUGHUB_ALLOWED_API_KEYS", [])
-    return supplied in allowed
+def _log_extra(request):
+    api_key = getattr(request, "api_key", None)
+    return {"ip": _client_ip(request), "api_key_id": api_key.key_id if api_key else None}
 
 
-def _paymongo_signature_valid(request):
-    secret = getattr(settings, "PAYMONGO_WEBHOOK_SECRET", "")
-    if not secret:
-        return False
+def _caller_identity(request, scope):
+    """Bucket identity for an authenticated caller: its key ID, or the client IP for webhooks."""
+    api_key = getattr(request, "api_key", None)
+    if api_key is not None and scope != throttling.PAYMONGO_WEBHOOK_SCOPE:
+        return f"key:{api_key.key_id}"
+    return f"ip:{_client_ip(request)}"
 
-    signature_header = request.headers.get("Paymongo-Signature") or request.META.get("HTTP_PAYMONGO_SIGNATURE")
-    if not signature_header:
-        return False
 
-    try:
-        parts = dict(item.split("=", 1) for item in signature_header.split(","))
-        timestamp = parts.get("t")
-        provided_sig = parts.get("v1")
-    except ValueError:
-        return False
+def _rate_limit_bucket(request, scope):
+    limit = throttling.get_rate_limit(scope, api_key=getattr(request, "api_key", None))
+    return f"throttle:{scope}:{_caller_identity(request, scope)}", limit
 
-    if not timestamp or not provided_sig:
-        return False
 
-    raw_body = request.body or b""
-    signed_string = f"{timestamp}.{raw_body.decode('utf-8', errors='replace')}"
-    expected = hmac.new(secret.encode("utf-8"), signed_string.encode("utf-8"), hashlib.sha256).hexdigest()
-    return hmac.compare_digest(expected, provided_sig)
+def _check_rate_limit(request, scope):
+    """Count the request against its own (scope, caller) bucket; scopes never share counters."""
+    result = throttling.get_limiter().hit(*_rate_limit_bucket(request, scope))
+    request.rate_limit = result
+    return result.allowed
 
 
-def _lower_dict_keys(data):
-    if not isinstance(data, dict):
-        return {}
-    return {str(k).lower(): v for k, v in data.items()}
+async def _acheck_rate_limit(request, scope):
+    result = await throttling.get_limiter().ahit(*_rate_limit_bucket(request, scope))
+    request.rate_limit = result
+    return result.allowed
 
 
-def _extract_payload(request):
-    try:
-        payload = json.loads(request.body.decode("utf-8") or "{}")
-    except (json.JSONDecodeError, UnicodeDecodeError):
-        return None, JsonResponse({"error": "Invalid JSON body"}, status=400)
+def _apply_rate_limit_headers(request, response):
+    result = getattr(request, "rate_limit", None)
+    if result is not None:
+        for header, value in result.headers().items():
+            response[header] = value
+    return response
 
-    if not isinstance(payload, dict):
-        return None, JsonResponse({"error": "Invalid JSON body"}, status=400)
 
-    lowered = _lower_dict_keys(payload)
-    data_obj = lowered.get("data")
-    if isinstance(data_obj, dict):
-        return _lower_dict_keys(data_obj), None
+def with_rate_limit_headers(view_func):
+    """Attach X-RateLimit-* (and Retry-After) headers from the request's throttle result."""
+    if iscoroutinefunction(view_func):
 
-    return lowered, None
+        async def async_wrapper(request, *args, **kwargs):
+            return _apply_rate_limit_headers(request, await view_func(request, *args, **kwargs))
 
+        return wraps(view_func)(async_wrapper)
 
-def _parse_paymongo_event(data):
-    """
-    Accepts lowered dict representing PayMongo webhook event envelope.
-    Returns a flattened dict with name, email, amount, reference, paymentid, status, used=False
-    or None if structure is not PayMongo event-like.
-    """
-    # Expect data -> attributes -> data -> attributes...
-    attributes = data.get("attributes") if isinstance(data, dict) else None
-    if not isinstance(attributes, dict):
-        return None
-    inner_data = attributes.get("data")
-    if not isinstance(inner_data, dict):
-        return None
-    pay_attributes = inner_data.get("attributes") if isinstance(inner_data.get("attributes"), dict) else None
-    if pay_attributes is None:
-        return None
-
-    # Extract billing
-    billing = pay_attributes.get("billing") or {}
-    email = (billing.get("email") or "").strip().lower()
-    name = (billing.get("name") or "").strip()
-
-    # Amount is in cents
-    amount_val = pay_attributes.get("amount")
-    try:
-        amount_php = Decimal(str(amount_val)) / Decimal("100")
-        amount_php = amount_php.quantize(Decimal("0.01"))
-    except (InvalidOperation, TypeError):
-        amount_php = None
-
-    status = (pay_attributes.get("status") or "").strip()
-
-    # Reference
-    reference = (
-        pay_attributes.get("reference_number")
-        or (pay_attributes.get("source") or {}).get("reference_number")
-        or ((pay_attributes.get("source") or {}).get("attributes") or {}).get("reference_number")
-    )
-    if reference:
-        reference = str(reference).strip()
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        return _apply_rate_limit_headers(request, view_func(request, *args, **kwargs))
 
-    payment_id = (inner_data.get("id") or "").strip()
+    return wrapper
 
-    if not any([email, name, amount_php, reference, payment_id, status]):
-        return None
 
-    return {
-        "name": name,
-        "email": email,
-        "amount": amount_php,
-        "reference": reference or "",
-        "paymentid": payment_id,
-        "status": status,
-        "used": False,
-    }
+def _check_api_key(request, endpoint):
+    """Resolve the supplied key against the registry and attach it to ``request.api_key``."""
+    api_key = apikeys.get_registry().resolve(_supplied_api_key(request))
+    if api_key is None or not api_key.allows(endpoint):
+        request.api_key = None
+        return False
+    request.api_key = api_key
+    return True
+
+
+def _paymongo_signature_valid(request):
+    signature_header = request.headers.get("Paymongo-Signature") or request.META.get("HTTP_PAYMONGO_SIGNATURE")
+    return paymongo.verify_signature(signature_header, request.body)
 
 
 @csrf_exempt
 @require_POST
+@payloads.limit_body_size
+@with_rate_limit_headers
 def check_user_details(request):
-    if not _check_api_key(request):
-        logger.warning("Unauthorized API call to check_user_details", extra={"ip": _client_ip(request)})
+    if not _check_api_key(request, "check_user_details"):
+        logger.warning("Unauthorized API call to check_user_details", extra=_log_extra(request))
         return JsonResponse({"error": "Unauthorized"}, status=401)
 
-    if not _check_rate_limit(request):
-        logger.warning("Rate limit exceeded for check_user_details", extra={"ip": _client_ip(request)})
+    if not _check_rate_limit(request, "check_user_details"):
+        logger.warning("Rate limit exceeded for check_user_details", extra=_log_extra(request))
         return JsonResponse({"error": "Rate limit exceeded"}, status=429)
 
-    data, error = _extract_payload(request)
+    data, error = payloads.extract_payload(request)
     if error:
         return error
 
@@ -354,98 +497,210 @@ def check_user_details(request):
     if ALLOWED_PRODUCTS and product not in ALLOWED_PRODUCTS:
         return JsonResponse({"error": "Unsupported product."}, status=400)
 
-    existing = CustomerSubscription.objects.filter(
-        product__iexact=product,
-        email__iexact=email,
-    ).first()
+    cached = status_cache.get(product, email)
+    if cached is not None:
+        return JsonResponse({"data": {"status": cached.upper()}})
 
+    existing = CustomerSubscription.objects.for_product_email(product, email).only("status", "status_text").first()
     if existing:
-        return JsonResponse({"data": {"status": existing.status.upper()}})
-
-    new_record = CustomerSubscription.objects.create(
-        external_id=_generate_external_id(product),
-        product=product,
-        email=email,
-        username="",
-        last_login=timezone.now(),
-        subscription_type=_subscription_type_for_product(product),
-        status=CustomerSubscription.Status.FREE,
+        status_cache.store(product, email, existing.get_status_display())
+        return JsonResponse({"data": {"status": existing.get_status_display().upper()}})
+
+    status, created = _insert_free_subscription(product, email)
+    return JsonResponse({"data": {"status": status.upper()}}, status=201 if created else 200)
+
+
+def _insert_free_subscription(product, email):
+    """Create the FREE row for a lookup miss. Returns ``(status label, created)``."""
+    new_record = _with_fresh_external_ids(
+        lambda: CustomerSubscription.objects.create_if_absent(
+            external_id=_generate_external_id(product),
+            product=product,
+            email=email,
+            username="",
+            last_login=timezone.now(),
+            subscription_type=_subscription_type_for_product(product),
+            status=CustomerSubscription.Status.FREE,
+        )
     )
 
-    return JsonResponse({"data": {"status": new_record.status.upper()}}, status=201)
+    if new_record is None:
+        # A concurrent request inserted the row between our lookup and insert.
+        existing = CustomerSubscription.objects.for_product_email(product, email).only("status", "status_text").first()
+        status_cache.store(product, email, existing.get_status_display())
+        return existing.get_status_display(), False
+
+    status_cache.store(product, email, new_record.get_status_display())
+    return new_record.get_status_display(), True
+
+
+def _flag(request, name):
+    return request.GET.get(name, "").strip().lower() in ("1", "true", "yes")
+
+
+@csrf_exempt
+@require_POST
+@payloads.body_size_limit("PLUGHUB_API_MAX_BATCH_BODY_BYTES")
+@with_rate_limit_headers
+def check_user_details_batch(request):
+    """
+    Read-only bulk status lookup for ``{email, product}`` items (JSON array or NDJSON).
+    Misses are reported as null unless ``?create_missing=1`` asks for FREE rows to be
+    created. ``?stream=1`` (or ``Accept: application/x-ndjson``) streams one NDJSON line
+    per pair instead of building the compact ``{product: {email: status}}`` mapping.
+    """
+    if not _check_api_key(request, "check_user_details_batch"):
+        logger.warning("Unauthorized API call to check_user_details_batch", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    if not _check_rate_limit(request, "check_user_details_batch"):
+        logger.warning("Rate limit exceeded for check_user_details_batch", extra=_log_extra(request))
+        return JsonResponse({"error": "Rate limit exceeded"}, status=429)
+
+    try:
+        items = payloads.decode_items(request.body, request.content_type)
+    except payloads.PayloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    max_items = getattr(settings, "PLUGHUB_STATUS_BATCH_MAX_ITEMS", 10000)
+    if len(items) > max_items:
+        return JsonResponse({"error": f"Batch exceeds {max_items} items"}, status=413)
+
+    pairs = {}
+    invalid = []
+    for index, item in enumerate(items):
+        if isinstance(item, payloads.PayloadError):
+            invalid.append(index)
+            continue
+        email = str(item.get("email") or "").strip().lower()
+        product = str(item.get("product") or "").strip().lower()
+        if not email or not product or (ALLOWED_PRODUCTS and product not in ALLOWED_PRODUCTS):
+            invalid.append(index)
+            continue
+        pairs[(product, email)] = None
+
+    create_missing = _flag(request, "create_missing")
+    chunk_size = getattr(settings, "PLUGHUB_STATUS_BATCH_CHUNK_SIZE", 1000)
+    pairs = list(pairs)
+    chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+
+    def resolve(chunk):
+        found = CustomerSubscription.objects.statuses_for(chunk)
+        if create_missing:
+            found.update(_create_free_subscriptions([pair for pair in chunk if pair not in found]))
+        for product, email in chunk:
+            status = found.get((product, email))
+            yield product, email, status.upper() if status else None
+
+    if _flag(request, "stream") or "application/x-ndjson" in request.headers.get("Accept", ""):
+        def lines():
+            for chunk in chunks:
+                for product, email, status in resolve(chunk):
+                    yield json.dumps({"product": product, "email": email, "status": status}) + "\n"
+            if invalid:
+                yield json.dumps({"invalid": invalid}) + "\n"
+
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+    statuses = {}
+    for chunk in chunks:
+        for product, email, status in resolve(chunk):
+            statuses.setdefault(product, {})[email] = status
+    return JsonResponse({"data": {"statuses": statuses, "invalid": invalid}})
 
 
 @csrf_exempt
 @require_POST
+@payloads.limit_body_size
+@with_rate_limit_headers
 def log_payments(request):
-    authorized = _check_api_key(request) or _paymongo_signature_valid(request)
-    if not authorized:
-        logger.warning("Unauthorized API call to log_payments", extra={"ip": _client_ip(request)})
+    api_key_valid = _check_api_key(request, "log_payments")
+    webhook_verified = not api_key_valid and _paymongo_signature_valid(request)
+    if not (api_key_valid or webhook_verified):
+        logger.warning("Unauthorized API call to log_payments", extra=_log_extra(request))
         return JsonResponse({"error": "Unauthorized"}, status=401)
 
-    if not _check_rate_limit(request):
-        logger.warning("Rate limit exceeded for log_payments", extra={"ip": _client_ip(request)})
+    scope = throttling.PAYMONGO_WEBHOOK_SCOPE if webhook_verified else "log_payments"
+    if not _check_rate_limit(request, scope):
+        logger.warning("Rate limit exceeded for log_payments", extra=_log_extra(request))
         return JsonResponse({"error": "Rate limit exceeded"}, status=429)
 
-    data, error = _extract_payload(request)
+    if ingest.accept_fast_enabled():
+        event = ingest.enqueue_event(request.body)
+        return JsonResponse({"data": {"queued": True, "event_id": event.id}}, status=202)
+
+    data, error = payloads.extract_payload(request)
     if error:
         return error
 
-    # Detect PayMongo event payload and map it
-    if data.get("type") == "event" or ("attributes" in data and isinstance(data.get("attributes"), dict)):
-        mapped = _parse_paymongo_event(data)
-        if mapped:
-            data = mapped
+    values, error = ingest.normalize_payment(data)
+    if error:
+        return JsonResponse({"error": error}, status=400)
 
-    # Fallback: if reference is missing but paymentid exists, reuse paymentid as reference
-    if not (data.get("reference") or "").strip():
-        data["reference"] = data.get("paymentid", "")
+    return _record_payment(values)
 
-    required_fields = ["name", "email", "amount", "reference", "paymentid", "status"]
-    missing = [field for field in required_fields if not str(data.get(field, "")).strip()]
-    if missing:
-        return JsonResponse({"error": f"Missing fields: {', '.join(missing)}"}, status=400)
 
+def _record_payment(values):
     try:
-        amount_val = Decimal(str(data.get("amount"))).quantize(Decimal("0.01"))
-    except (InvalidOperation, TypeError):
-        return JsonResponse({"error": "Amount must be a valid number"}, status=400)
-
-    record = PaymentRecord.objects.create(
-        name=data.get("name", "").strip(),
-        email=data.get("email", "").strip().lower(),
-        amount=amount_val,
-        reference_number=data.get("reference", "").strip(),
-        payment_id=data.get("paymentid", "").strip(),
-        status=data.get("status", "").strip(),
-        used=False,
-    )
+        record, created = PaymentRecord.objects.upsert_by_payment_id(**values)
+    except IntegrityError:
+        # Same reference number already recorded under a different payment ID.
+        return JsonResponse({"error": "Reference already recorded for another payment"}, status=409)
 
     return JsonResponse(
         {
             "data": {
                 "id": record.id,
                 "reference": record.reference_number,
-                "status": record.status,
+                "status": record.get_status_display(),
                 "used": record.used,
             }
         },
-        status=201,
+        status=201 if created else 200,
     )
 
 
 @csrf_exempt
 @require_POST
+@payloads.body_size_limit("PLUGHUB_API_MAX_BATCH_BODY_BYTES")
+@with_rate_limit_headers
+def log_payments_batch(request):
+    if not _check_api_key(request, "log_payments_batch"):
+        logger.warning("Unauthorized API call to log_payments_batch", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    if not _check_rate_limit(request, "log_payments_batch"):
+        logger.warning("Rate limit exceeded for log_payments_batch", extra=_log_extra(request))
+        return JsonResponse({"error": "Rate limit exceeded"}, status=429)
+
+    try:
+        items = payloads.decode_items(request.body, request.content_type)
+    except payloads.PayloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    max_items = getattr(settings, "PLUGHUB_LOG_PAYMENTS_BATCH_MAX_ITEMS", 5000)
+    if len(items) > max_items:
+        return JsonResponse({"error": f"Batch exceeds {max_items} items"}, status=413)
+
+    results = ingest.ingest_batch(items)
+    failed = sum(1 for result in results if "error" in result)
+    return JsonResponse({"data": {"accepted": len(results) - failed, "failed": failed, "results": results}})
+
+
+@csrf_exempt
+@require_POST
+@payloads.limit_body_size
+@with_rate_limit_headers
 def license_consume(request):
-    if not _check_api_key(request):
-        logger.warning("Unauthorized API call to license_consume", extra={"ip": _client_ip(request)})
+    if not _check_api_key(request, "license_consume"):
+        logger.warning("Unauthorized API call to license_consume", extra=_log_extra(request))
         return JsonResponse({"error": "Unauthorized"}, status=401)
 
-    if not _check_rate_limit(request):
-        logger.warning("Rate limit exceeded for license_consume", extra={"ip": _client_ip(request)})
+    if not _check_rate_limit(request, "license_consume"):
+        logger.warning("Rate limit exceeded for license_consume", extra=_log_extra(request))
         return JsonResponse({"error": "Rate limit exceeded"}, status=429)
 
-    data, error = _extract_payload(request)
+    data, error = payloads.extract_payload(request)
     if error:
         return error
 
@@ -456,44 +711,133 @@ def license_consume(request):
     if not product or not reference or not email:
         return JsonResponse({"error": "Product, reference, and email are required"}, status=400)
 
-    payment = PaymentRecord.objects.filter(reference_number__iexact=reference).first()
-    if not payment:
-        return JsonResponse({"error": "Reference not found"}, status=404)
+    payment, error = _consume_license(product, reference, email)
+    if error:
+        return JsonResponse({"error": error}, status=404)
+    return JsonResponse({"data": _consume_result(payment, email)})
 
-    if payment.used:
-        return JsonResponse({"error": "Resource not found"}, status=404)
 
-    payment.used = True
-    payment.date_consumed = timezone.now()
-    payment.save(update_fields=["used", "date_consumed", "updated_at"])
+def _consume_license(product, reference, email):
+    """Consume ``reference`` and upgrade the subscription atomically. Returns ``(payment, error)``."""
+    with transaction.atomic():
+        payment = PaymentRecord.objects.consume(reference)
+        if payment is None:
+            if PaymentRecord.objects.known_references([reference]):
+                return None, "Resource not found"
+            return None, "Reference not found"
 
-    if product == "gmail-addon-cleaner":
-        subscription = CustomerSubscription.objects.filter(
-            Q(email__iexact=email) & Q(product__iexact=product)
-        ).first()
-        if subscription:
-            subscription.subscription_type = "One-time"
-            subscription.status = CustomerSubscription.Status.PAID
-            subscription.save(update_fields=["subscription_type", "status", "updated_at"])
-        else:
-            CustomerSubscription.objects.create(
-                external_id=_generate_external_id(product),
-                product=product,
-                email=email or payment.email.lower(),
-                username="",
-                last_login=timezone.now(),
-                subscription_type="One-time",
-                status=CustomerSubscription.Status.PAID,
-            )
+        if product == "gmail-addon-cleaner":
+            _mark_subscription_paid(product, email or payment.email.lower())
+
+    return payment, None
+
+
+def _consume_result(payment, email):
+    return {
+        "reference": payment.reference_number,
+        "used": payment.used,
+        "status": payment.get_status_display(),
+        "date_consumed": payment.date_consumed.isoformat() if payment.date_consumed else None,
+        "email": email,
+    }
+
+
+def _license_batch_items(payload):
+    """
+    Normalize a license_consume batch body into item dicts. Accepts a list of
+    ``{product, reference, email}`` objects (bare or under ``data``), or a single
+    ``{product, email, references: [...]}`` object.
+    """
+    if isinstance(payload, dict):
+        data = payloads.select_data(payload)
+        if isinstance(data.get("data"), list):
+            payload = data["data"]
+        elif isinstance(data.get("references"), list):
+            return [
+                {"product": data.get("product"), "email": data.get("email"), "reference": reference}
+                for reference in data["references"]
+            ]
+    if not isinstance(payload, list):
+        raise payloads.PayloadError("Expected a JSON array of items or a references list")
+    return [payloads.select_data(item) if isinstance(item, dict) else None for item in payload]
+
+
+@csrf_exempt
+@require_POST
+@payloads.body_size_limit("PLUGHUB_API_MAX_BATCH_BODY_BYTES")
+@with_rate_limit_headers
+def license_consume_batch(request):
+    if not _check_api_key(request, "license_consume_batch"):
+        logger.warning("Unauthorized API call to license_consume_batch", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    if not _check_rate_limit(request, "license_consume_batch"):
+        logger.warning("Rate limit exceeded for license_consume_batch", extra=_log_extra(request))
+        return JsonResponse({"error": "Rate limit exceeded"}, status=429)
+
+    try:
+        items = _license_batch_items(payloads.loads(request.body or b"[]"))
+    except (ValueError, UnicodeDecodeError) as exc:
+        message = str(exc) if isinstance(exc, payloads.PayloadError) else "Invalid JSON body"
+        return JsonResponse({"error": message}, status=400)
+
+    max_items = getattr(settings, "PLUGHUB_LICENSE_CONSUME_BATCH_MAX_ITEMS", 1000)
+    if len(items) > max_items:
+        return JsonResponse({"error": f"Batch exceeds {max_items} items"}, status=413)
+
+    results = [None] * len(items)
+    wanted = {}
+    for index, item in enumerate(items):
+        product = str((item or {}).get("product") or "").strip().lower()
+        reference = str((item or {}).get("reference") or "").strip()
+        email = str((item or {}).get("email") or "").strip().lower()
+        if not product or not reference or not email:
+            results[index] = {"reference": reference, "error": "Product, reference, and email are required"}
+            continue
+        # A reference can only be consumed once; later duplicates in the batch fail like a reuse.
+        if reference.lower() in wanted:
+            results[index] = {"reference": reference, "error": "Resource not found"}
+            continue
+        wanted[reference.lower()] = (index, product, email, reference)
+
+    with transaction.atomic():
+        consumed = {
+            payment.reference_number.lower(): payment
+            for payment in PaymentRecord.objects.consume_many(wanted)
+        }
+        known = PaymentRecord.objects.known_references(reference for reference in wanted if reference not in consumed)
+
+        upgrades = {}
+        for lowered, (index, product, email, reference) in wanted.items():
+            payment = consumed.get(lowered)
+            if payment is None:
+                error = "Resource not found" if lowered in known else "Reference not found"
+                results[index] = {"reference": reference, "error": error}
+                continue
+            results[index] = _consume_result(payment, email)
+            if product == "gmail-addon-cleaner":
+                upgrades[(product, email)] = None
+
+        _mark_subscriptions_paid(list(upgrades))
+
+    return JsonResponse({"data": {"results": results}})
+
+
+@require_GET
+def api_metrics(request):
+    if not _check_api_key(request, "metrics"):
+        logger.warning("Unauthorized API call to api_metrics", extra=_log_extra(request))
+        return JsonResponse({"error": "Unauthorized"}, status=401)
 
+    # Cache and connection counters are per worker process; the payment queue figures are global.
     return JsonResponse(
         {
             "data": {
-                "reference": payment.reference_number,
-                "used": payment.used,
-                "status": payment.status,
-                "date_consumed": payment.date_consumed.isoformat() if payment.date_consumed else None,
-                "email": email,
+                "status_cache": status_cache.stats(),
+                "search_routes": search.stats(),
+                "db_connections": dbtiming.stats(),
+                "local_cache": caches["default"].stats() if isinstance(caches["default"], TieredCache) else None,
+                "payment_queue": ingest.queue_stats(),
             }
         }
     )